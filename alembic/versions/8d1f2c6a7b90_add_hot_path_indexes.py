@@ -0,0 +1,38 @@
+"""Add hot path indexes
+
+Revision ID: 8d1f2c6a7b90
+Revises: 455e37806038
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d1f2c6a7b90'
+down_revision = '455e37806038'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('charityproject', 'donation'):
+        is_open = sa.column('fully_invested').is_(False)
+        op.create_index(
+            f'ix_{table}_open_create_date',
+            table,
+            ['create_date', 'id'],
+            unique=False,
+            sqlite_where=is_open,
+            postgresql_where=is_open,
+        )
+    op.create_index(
+        'ix_donation_user_id_id', 'donation', ['user_id', 'id'], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index('ix_donation_user_id_id', table_name='donation')
+    for table in ('donation', 'charityproject'):
+        op.drop_index(f'ix_{table}_open_create_date', table_name=table)
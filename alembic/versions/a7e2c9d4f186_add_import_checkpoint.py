@@ -0,0 +1,32 @@
+"""Add import checkpoint
+
+Revision ID: a7e2c9d4f186
+Revises: f6d1a3b8c475
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7e2c9d4f186'
+down_revision = 'f6d1a3b8c475'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'importcheckpoint',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('source', sa.String(length=1024), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.Column('update_date', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('source')
+    )
+
+
+def downgrade():
+    op.drop_table('importcheckpoint')
@@ -0,0 +1,32 @@
+"""Add version columns
+
+Revision ID: b3e9a4c1d2f5
+Revises: 8d1f2c6a7b90
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3e9a4c1d2f5'
+down_revision = '8d1f2c6a7b90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('charityproject', 'donation'):
+        op.add_column(
+            table,
+            sa.Column(
+                'version', sa.Integer(), nullable=False, server_default='1'
+            ),
+        )
+
+
+def downgrade():
+    for table in ('donation', 'charityproject'):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('version')
@@ -0,0 +1,30 @@
+"""Add fund stats generation
+
+Revision ID: b8f3d1e5a297
+Revises: a7e2c9d4f186
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8f3d1e5a297'
+down_revision = 'a7e2c9d4f186'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        'fundstats',
+        sa.Column(
+            'generation', sa.Integer(), nullable=False, server_default='0'
+        ),
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('fundstats') as batch_op:
+        batch_op.drop_column('generation')
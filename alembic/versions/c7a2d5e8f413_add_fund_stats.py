@@ -0,0 +1,42 @@
+"""Add fund stats
+
+Revision ID: c7a2d5e8f413
+Revises: b3e9a4c1d2f5
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7a2d5e8f413'
+down_revision = 'b3e9a4c1d2f5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'fundstats',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('raised_amount', sa.Integer(), nullable=False),
+        sa.Column('invested_amount', sa.Integer(), nullable=False),
+        sa.Column('open_projects', sa.Integer(), nullable=False),
+        sa.Column('closed_projects', sa.Integer(), nullable=False),
+        sa.Column('donors', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.execute(
+        'INSERT INTO fundstats (id, raised_amount, invested_amount, '
+        'open_projects, closed_projects, donors) SELECT 1, '
+        '(SELECT COALESCE(SUM(full_amount), 0) FROM donation), '
+        '(SELECT COALESCE(SUM(invested_amount), 0) FROM donation), '
+        '(SELECT COUNT(*) FROM charityproject WHERE NOT fully_invested), '
+        '(SELECT COUNT(*) FROM charityproject WHERE fully_invested), '
+        '(SELECT COUNT(DISTINCT user_id) FROM donation)'
+    )
+
+
+def downgrade():
+    op.drop_table('fundstats')
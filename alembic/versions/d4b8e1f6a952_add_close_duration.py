@@ -0,0 +1,68 @@
+"""Add close duration
+
+Revision ID: d4b8e1f6a952
+Revises: c7a2d5e8f413
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4b8e1f6a952'
+down_revision = 'c7a2d5e8f413'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table_name in ('charityproject', 'donation'):
+        op.add_column(
+            table_name, sa.Column('duration', sa.Integer(), nullable=True)
+        )
+        table = sa.table(
+            table_name,
+            sa.column('id', sa.Integer),
+            sa.column('create_date', sa.DateTime),
+            sa.column('close_date', sa.DateTime),
+            sa.column('duration', sa.Integer),
+        )
+        bind = op.get_bind()
+        rows = bind.execute(
+            sa.select(table.c.id, table.c.create_date, table.c.close_date)
+            .where(table.c.close_date.isnot(None))
+        ).all()
+        if rows:
+            bind.execute(
+                table.update().where(
+                    table.c.id == sa.bindparam('row_id')
+                ).values(duration=sa.bindparam('row_duration')),
+                [
+                    {
+                        'row_id': row.id,
+                        'row_duration': int(
+                            (row.close_date - row.create_date).total_seconds()
+                        ),
+                    }
+                    for row in rows
+                ],
+            )
+    is_closed = sa.column('fully_invested').is_(True)
+    op.create_index(
+        'ix_charityproject_closed_duration',
+        'charityproject',
+        ['duration', 'id'],
+        unique=False,
+        sqlite_where=is_closed,
+        postgresql_where=is_closed,
+    )
+
+
+def downgrade():
+    op.drop_index(
+        'ix_charityproject_closed_duration', table_name='charityproject'
+    )
+    for table_name in ('donation', 'charityproject'):
+        with op.batch_alter_table(table_name) as batch_op:
+            batch_op.drop_column('duration')
@@ -0,0 +1,45 @@
+"""Add donation intake
+
+Revision ID: e5c9f2a7b364
+Revises: d4b8e1f6a952
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5c9f2a7b364'
+down_revision = 'd4b8e1f6a952'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'donationintake',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('full_amount', sa.Integer(), nullable=False),
+        sa.Column('comment', sa.Text(), nullable=True),
+        sa.Column('create_date', sa.DateTime(), nullable=True),
+        sa.Column('donation_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['donation_id'], ['donation.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    is_pending = sa.column('donation_id').is_(None)
+    op.create_index(
+        'ix_donationintake_pending',
+        'donationintake',
+        ['id'],
+        unique=False,
+        sqlite_where=is_pending,
+        postgresql_where=is_pending,
+    )
+
+
+def downgrade():
+    op.drop_index('ix_donationintake_pending', table_name='donationintake')
+    op.drop_table('donationintake')
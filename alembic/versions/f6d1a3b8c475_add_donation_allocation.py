@@ -0,0 +1,54 @@
+"""Add donation allocation ledger
+
+Revision ID: f6d1a3b8c475
+Revises: e5c9f2a7b364
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f6d1a3b8c475'
+down_revision = 'e5c9f2a7b364'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'donation_allocation',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('donation_id', sa.Integer(), nullable=False),
+        sa.Column('project_id', sa.Integer(), nullable=False),
+        sa.Column('amount', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['donation_id'], ['donation.id'], ),
+        sa.ForeignKeyConstraint(['project_id'], ['charityproject.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(
+        'ix_donation_allocation_project_id_donation_id',
+        'donation_allocation',
+        ['project_id', 'donation_id'],
+        unique=False,
+    )
+    op.create_index(
+        'ix_donation_allocation_donation_id_project_id',
+        'donation_allocation',
+        ['donation_id', 'project_id'],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index(
+        'ix_donation_allocation_donation_id_project_id',
+        table_name='donation_allocation',
+    )
+    op.drop_index(
+        'ix_donation_allocation_project_id_donation_id',
+        table_name='donation_allocation',
+    )
+    op.drop_table('donation_allocation')
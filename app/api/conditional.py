@@ -0,0 +1,52 @@
+import hashlib
+from typing import Awaitable, Callable, Hashable, List, Type
+
+from fastapi import Request, Response
+from pydantic import BaseModel
+
+from app.api.serialization import dump_rows
+from app.core.cache import TTLCache, data_version
+from app.core.config import settings
+
+# Query key -> (data version, serialized body, ETag).
+project_list_cache = TTLCache(
+    settings.project_list_cache_size, settings.project_list_cache_ttl
+)
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Check the ETag against the If-None-Match request header."""
+    header = request.headers.get('if-none-match')
+    if header is None:
+        return False
+    tags = {tag.strip() for tag in header.split(',')}
+    return '*' in tags or etag in tags or f'W/{etag}' in tags
+
+
+async def conditional_response(
+    request: Request,
+    cache: TTLCache,
+    key: Hashable,
+    load: Callable[[], Awaitable[List]],
+    schema: Type[BaseModel],
+    exclude_none: bool = False,
+) -> Response:
+    """
+    JSON list response with an ETag, answering If-None-Match with 304.
+    The serialized body is cached until the data version changes, so
+    repeated polls neither query the database nor serialize the objects.
+    """
+    version = data_version.value
+    entry = cache.get(key)
+    if entry is None or entry[0] != version:
+        db_objs = await load()
+        body = dump_rows(db_objs, schema, exclude_none)
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        entry = (version, body, etag)
+        cache.set(key, entry)
+    _, body, etag = entry
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={'ETag': etag})
+    return Response(
+        body, media_type='application/json', headers={'ETag': etag}
+    )
@@ -1,19 +1,23 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.validators import (check_charity_project_exists,
-                                check_full_amount, check_name_duplicate,
-                                check_project_fully_invested,
-                                check_project_is_invested)
-from app.core.db import get_async_session
+from app.api.conditional import conditional_response, project_list_cache
+from app.api.serialization import schema_columns
+from app.api.streaming import ndjson_response, wants_ndjson
+from app.api.validators import (check_charity_project_exists, check_fields,
+                                check_name_unique, check_project_is_invested,
+                                check_project_updated)
+from app.core.db import get_async_session, get_read_session
 from app.core.user import current_superuser
 from app.crud.charity_project import charity_project_crud
 from app.crud.donation import donation_crud
 from app.schemas.charity_project import (CharityProjectCreate,
                                          CharityProjectDB,
+                                         CharityProjectDuration,
                                          CharityProjectUpdate)
+from app.services.allocation_engine import allocation_engine
 from app.services.investment import investment
 
 router = APIRouter()
@@ -25,10 +29,58 @@ router = APIRouter()
     response_model_exclude_none=True,
 )
 async def get_all_charity_projects(
-    session: AsyncSession = Depends(get_async_session)
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1),
+    after: Optional[int] = None,
+    fields: Optional[str] = Query(None, example='name,invested_amount'),
+    session: AsyncSession = Depends(get_read_session),
 ):
-    """Get list of all projects."""
-    return await charity_project_crud.get_multi(session)
+    """
+    Get list of all projects.
+    Pages are requested with `limit` and the last seen id in `after`.
+    `fields` lists the returned fields, comma separated (id is always
+    returned); the other columns are not loaded.
+    `Accept: application/x-ndjson` streams projects one per line.
+    Responses carry an ETag and `If-None-Match` is answered with 304.
+    """
+    schema = check_fields(CharityProjectDB, fields)
+    columns = schema_columns(schema)
+    if wants_ndjson(request):
+        return ndjson_response(
+            charity_project_crud.stream_multi(session, limit, after, columns),
+            schema,
+            exclude_none=True,
+        )
+    return await conditional_response(
+        request,
+        project_list_cache,
+        (limit, after, columns),
+        lambda: charity_project_crud.get_multi_rows(
+            session, columns, limit, after
+        ),
+        schema,
+        exclude_none=True,
+    )
+
+
+@router.get(
+    '/fastest',
+    response_model=List[CharityProjectDuration],
+    response_model_exclude_none=True,
+    dependencies=[Depends(current_superuser)],
+)
+async def get_fastest_closed_projects(
+    limit: int = Query(10, ge=1),
+    after: Optional[int] = None,
+    session: AsyncSession = Depends(get_read_session),
+):
+    """
+    Closed projects ranked by funding time in seconds (only for superusers).
+    The next page starts after the last seen project id in `after`.
+    """
+    return await charity_project_crud.get_fastest_closed(
+        session, limit, after
+    )
 
 
 @router.post(
@@ -42,9 +94,11 @@ async def create_new_charity_project(
     session: AsyncSession = Depends(get_async_session),
 ):
     """Create project (only for superusers)."""
-    await check_name_duplicate(charity_project.name, session)
-    new_project = await charity_project_crud.create(charity_project, session)
-    await investment(new_project, donation_crud, session)
+    new_project = await charity_project_crud.create(
+        charity_project, session, commit=False
+    )
+    with check_name_unique():
+        await investment(new_project, donation_crud, session)
     return new_project
 
 
@@ -62,6 +116,7 @@ async def remove_charity_project(
     charity_project = await charity_project_crud.remove(
         charity_project, session
     )
+    allocation_engine.discard(charity_project)
     return charity_project
 
 
@@ -76,15 +131,12 @@ async def partially_update_charity_project(
     session: AsyncSession = Depends(get_async_session),
 ):
     """Edit an unclosed project (only for superusers)."""
-    charity_project = await check_charity_project_exists(project_id, session)
-    check_project_fully_invested(charity_project)
-    if obj_in.name is not None:
-        await check_name_duplicate(obj_in.name, session)
-    if obj_in.full_amount is not None:
-        charity_project = check_full_amount(
-            charity_project, obj_in.full_amount
+    with check_name_unique():
+        charity_project = await charity_project_crud.update_open(
+            project_id, obj_in, session
         )
-    charity_project = await charity_project_crud.update(
-        charity_project, obj_in, session
+    charity_project = await check_project_updated(
+        charity_project, project_id, obj_in, session
     )
+    allocation_engine.sync(charity_project)
     return charity_project
@@ -1,33 +1,85 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.db import get_async_session
+from app.api.serialization import RowsResponse, schema_columns
+from app.api.streaming import ndjson_response, wants_ndjson
+from app.api.validators import check_fields
+from app.core.config import settings
+from app.core.db import get_async_session, get_read_session
 from app.core.user import current_superuser, current_user
 from app.crud.charity_project import charity_project_crud
 from app.crud.donation import donation_crud
+from app.crud.donation_intake import donation_intake_crud
 from app.models import User
-from app.schemas.donation import DonationCreate, DonationDB, DonationMyDB
-from app.services.investment import investment
+from app.schemas.donation import (DonationCreate, DonationDB,
+                                  DonationIntakeDB, DonationMyDB)
+from app.services.intake import intake_worker
+from app.services.investment import batch_investment, investment
 
 router = APIRouter()
 
 
 @router.post(
-    '/', response_model=DonationMyDB, response_model_exclude_none=True,
+    '/',
+    response_model=DonationMyDB,
+    response_model_exclude_none=True,
+    responses={202: {
+        'model': DonationIntakeDB,
+        'description': 'Accepted for allocation by the intake worker',
+    }},
 )
 async def create_donation(
+    request: Request,
     reservation: DonationCreate,
     session: AsyncSession = Depends(get_async_session),
     user: User = Depends(current_user),
 ):
-    """Create donation."""
-    new_donation = await donation_crud.create(reservation, session, user)
+    """
+    Create donation.
+    In the async intake mode the donation is only accepted: the response is
+    202 with the intake status URL in the Location header.
+    """
+    if settings.donation_intake == 'async':
+        intake = await donation_intake_crud.create(reservation, session, user)
+        intake_worker.notify()
+        return JSONResponse(
+            jsonable_encoder(
+                DonationIntakeDB.from_orm(intake), exclude_none=True
+            ),
+            status_code=202,
+            headers={'Location': request.url_for(
+                'get_donation_intake', intake_id=intake.id
+            )},
+        )
+    new_donation = await donation_crud.create(
+        reservation, session, user, commit=False
+    )
     await investment(new_donation, charity_project_crud, session)
     return new_donation
 
 
+@router.post(
+    '/batch',
+    response_model=List[DonationMyDB],
+    response_model_exclude_none=True,
+)
+async def create_donations_batch(
+    reservations: List[DonationCreate],
+    session: AsyncSession = Depends(get_async_session),
+    user: User = Depends(current_user),
+):
+    """Create several donations in one transaction."""
+    new_donations = await donation_crud.create_multi(
+        reservations, session, user
+    )
+    await batch_investment(new_donations, charity_project_crud, session)
+    return new_donations
+
+
 @router.get(
     '/',
     response_model=List[DonationDB],
@@ -35,16 +87,63 @@ async def create_donation(
     response_model_exclude_none=True,
 )
 async def get_all_donations(
-    session: AsyncSession = Depends(get_async_session)
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1),
+    after: Optional[int] = None,
+    fields: Optional[str] = Query(None, example='full_amount,invested_amount'),
+    session: AsyncSession = Depends(get_read_session),
 ):
-    """Get list of all donations (only for superusers)."""
-    return await donation_crud.get_multi(session)
+    """
+    Get list of all donations (only for superusers).
+    Supports keyset pagination, sparse `fields` and NDJSON streaming like
+    the projects list.
+    """
+    schema = check_fields(DonationDB, fields)
+    columns = schema_columns(schema)
+    if wants_ndjson(request):
+        return ndjson_response(
+            donation_crud.stream_multi(session, limit, after, columns),
+            schema,
+            exclude_none=True,
+        )
+    return RowsResponse(
+        await donation_crud.get_multi_rows(session, columns, limit, after),
+        schema,
+        exclude_none=True,
+    )
+
+
+@router.get(
+    '/intake/{intake_id}',
+    response_model=DonationIntakeDB,
+    response_model_exclude_none=True,
+)
+async def get_donation_intake(
+    intake_id: int,
+    session: AsyncSession = Depends(get_read_session),
+    user: User = Depends(current_user),
+):
+    """Allocation status of a donation accepted in the async intake mode."""
+    intake = await donation_intake_crud.get_by_user(intake_id, user, session)
+    if intake is None:
+        raise HTTPException(status_code=404, detail='Donation was not found!')
+    return intake
 
 
 @router.get('/my', response_model=List[DonationMyDB])
 async def get_my_donations(
-    session: AsyncSession = Depends(get_async_session),
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1),
+    after: Optional[int] = None,
+    session: AsyncSession = Depends(get_read_session),
     user: User = Depends(current_user)
 ):
     """Get list of current user's donations."""
-    return await donation_crud.get_by_user(session=session, user=user)
+    if wants_ndjson(request):
+        return ndjson_response(
+            donation_crud.stream_by_user(session, user, limit, after),
+            DonationMyDB,
+        )
+    return await donation_crud.get_by_user(
+        session=session, user=user, limit=limit, after=after
+    )
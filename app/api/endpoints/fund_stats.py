@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.db import get_async_session
+from app.crud.fund_stats import fund_stats_crud
+from app.schemas.fund_stats import FundStatsDB
+
+router = APIRouter()
+
+
+@router.get('', response_model=FundStatsDB)
+@router.get('/', response_model=FundStatsDB, include_in_schema=False)
+async def get_fund_stats(
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Get fund totals: money raised, invested and pending, projects, donors."""
+    return await fund_stats_crud.get(session)
@@ -0,0 +1,18 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.core.metrics import registry
+
+router = APIRouter()
+
+
+class PrometheusResponse(PlainTextResponse):
+    media_type = 'text/plain; version=0.0.4'
+
+
+@router.get(
+    '/metrics', response_class=PrometheusResponse, include_in_schema=False
+)
+async def get_metrics():
+    """Metrics in the Prometheus text format."""
+    return registry.render()
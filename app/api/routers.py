@@ -1,6 +1,7 @@
 from fastapi import APIRouter
 
 from app.api.endpoints import (charity_project_router, donation_router,
+                               fund_stats_router, metrics_router,
                                user_router)
 
 main_router = APIRouter()
@@ -10,4 +11,8 @@ main_router.include_router(
 main_router.include_router(
     donation_router, prefix='/donation', tags=['Donations']
 )
+main_router.include_router(
+    fund_stats_router, prefix='/stats', tags=['Statistics']
+)
 main_router.include_router(user_router)
+main_router.include_router(metrics_router)
@@ -0,0 +1,25 @@
+from typing import AsyncIterator, Type
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+
+
+def wants_ndjson(request: Request) -> bool:
+    """Check if the client asked for a streamed NDJSON response."""
+    return NDJSON_MEDIA_TYPE in request.headers.get('accept', '')
+
+
+def ndjson_response(
+    db_objs: AsyncIterator,
+    schema: Type[BaseModel],
+    exclude_none: bool = False,
+) -> StreamingResponse:
+    """Serialize objects one per line as they are fetched."""
+    async def lines():
+        async for db_obj in db_objs:
+            obj = schema.from_orm(db_obj)
+            yield obj.json(exclude_none=exclude_none) + '\n'
+    return StreamingResponse(lines(), media_type=NDJSON_MEDIA_TYPE)
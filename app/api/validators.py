@@ -1,9 +1,15 @@
+from contextlib import contextmanager
+from typing import Iterator, Optional, Type
+
 from fastapi import HTTPException
+from pydantic import BaseModel
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api.serialization import narrow_schema
 from app.crud.charity_project import charity_project_crud
 from app.models import CharityProject
-from app.services.investment import close_investment
+from app.schemas.charity_project import CharityProjectUpdate
 
 
 async def check_charity_project_exists(
@@ -16,20 +22,48 @@ async def check_charity_project_exists(
     return project
 
 
-async def check_name_duplicate(
-    project_name: str, session: AsyncSession
-) -> None:
-    """Check the uniqueness of the project name."""
-    project_id = await charity_project_crud.get_project_id_by_name(
-        project_name, session
-    )
-    if project_id is not None:
+# SQLite reports the column, PostgreSQL the default constraint name.
+NAME_CONSTRAINTS = (
+    f'{CharityProject.__tablename__}.name',
+    f'{CharityProject.__tablename__}_name_key',
+)
+
+
+@contextmanager
+def check_name_unique() -> Iterator[None]:
+    """
+    Map a violation of the unique project name to 400.
+    Any other integrity error is not a client mistake and is re-raised.
+    """
+    try:
+        yield
+    except IntegrityError as error:
+        if not any(
+            constraint in str(error.orig) for constraint in NAME_CONSTRAINTS
+        ):
+            raise
         raise HTTPException(
             status_code=400,
             detail='Project with the same name already exists!',
         )
 
 
+def check_fields(
+    schema: Type[BaseModel], fields: Optional[str]
+) -> Type[BaseModel]:
+    """Narrow the schema to the comma separated `fields`, id is always kept."""
+    if fields is None:
+        return schema
+    names = {name.strip() for name in fields.split(',')} - {''}
+    unknown = names - set(schema.__fields__)
+    if unknown:
+        raise HTTPException(
+            status_code=422,
+            detail=f'Unknown fields: {", ".join(sorted(unknown))}',
+        )
+    return narrow_schema(schema, tuple(sorted(names | {'id'})))
+
+
 def check_project_fully_invested(project: CharityProject) -> None:
     """Check if project is closed."""
     if project.fully_invested:
@@ -47,15 +81,29 @@ def check_project_is_invested(project: CharityProject) -> None:
         )
 
 
-def check_full_amount(
-    project: CharityProject, full_amount: int
-) -> CharityProject:
+def check_full_amount(project: CharityProject, full_amount: int) -> None:
     """Validate full_amount field changes."""
     if full_amount < project.invested_amount:
         raise HTTPException(
             status_code=400,
             detail='More funds have already been contributed to the project!'
         )
-    if full_amount == project.invested_amount:
-        close_investment(project)
-    return project
+
+
+async def check_project_updated(
+    project: Optional[CharityProject],
+    project_id: int,
+    obj_in: CharityProjectUpdate,
+    session: AsyncSession,
+) -> CharityProject:
+    """Explain why the conditional update has not matched the project."""
+    if project is not None:
+        return project
+    project = await check_charity_project_exists(project_id, session)
+    check_project_fully_invested(project)
+    if obj_in.full_amount is not None:
+        check_full_amount(project, obj_in.full_amount)
+    raise HTTPException(
+        status_code=409,
+        detail='The project was changed concurrently, try again!',
+    )
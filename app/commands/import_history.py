@@ -0,0 +1,78 @@
+"""
+Bulk import of historical users, projects and donations from CSV (with a
+header row) or JSONL files, followed by one allocation pass:
+
+    python -m app.commands.import_history --users users.csv \\
+        --projects projects.jsonl --donations donations.csv
+
+Columns: users - email, hashed_password or password, is_active,
+is_superuser, is_verified; projects - name, description, full_amount,
+create_date; donations - full_amount, comment, user_id or user_email,
+create_date. Dates are ISO 8601.
+
+Progress is printed as JSON lines. Every committed chunk is checkpointed
+in the database: running the same command again after an interruption
+continues where it stopped. Stop the allocation traffic while importing.
+"""
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+from app.core.db import AsyncSessionLocal
+from app.core.password import password_hasher
+from app.services.bulk_import import (SOURCES, RecordError, allocate_all,
+                                      import_file)
+
+
+def print_progress(source: str, imported: int, rate: float) -> None:
+    print(json.dumps({
+        'source': source,
+        'imported': imported,
+        'records_per_second': round(rate),
+    }), flush=True)
+
+
+async def main(files: dict, chunk_size: int, allocate: bool) -> None:
+    try:
+        for kind in SOURCES:
+            if files[kind] is not None:
+                await import_file(
+                    AsyncSessionLocal, kind, files[kind], chunk_size,
+                    print_progress,
+                )
+    finally:
+        password_hasher.shutdown()
+    if allocate:
+        report = await allocate_all(AsyncSessionLocal, chunk_size)
+        print(json.dumps({
+            'allocated': report.checked,
+            'updated': report.drifted,
+        }), flush=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    for kind in SOURCES:
+        parser.add_argument(f'--{kind}', type=Path, metavar='FILE')
+    parser.add_argument(
+        '--chunk-size', type=int, default=10000,
+        help='records inserted per transaction',
+    )
+    parser.add_argument(
+        '--no-allocate', action='store_true',
+        help='skip the allocation pass, e.g. before importing more files',
+    )
+    args = parser.parse_args()
+    try:
+        asyncio.run(main(
+            {kind: getattr(args, kind) for kind in SOURCES},
+            args.chunk_size,
+            not args.no_allocate,
+        ))
+    except RecordError as error:
+        sys.exit(f'Import stopped: {error}')
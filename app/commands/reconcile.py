@@ -0,0 +1,52 @@
+"""
+Recompute the invested amounts, closed flags and close dates of all
+donations and projects by replaying them in creation order:
+
+    python -m app.commands.reconcile --dry-run > drift.jsonl
+    python -m app.commands.reconcile --chunk-size 50000
+
+Drifted rows are printed as JSON lines with [stored, replayed] values,
+followed by a summary line. Without --dry-run the repairs, the rebuilt
+allocation ledger and the rebuilt fund statistics are committed in one
+transaction, which holds the write lock for the whole run: stop the
+allocation traffic first.
+"""
+import argparse
+import asyncio
+import json
+
+from app.core.db import AsyncSessionLocal
+from app.services.reconciliation import Drift, reconcile
+
+
+def print_drift(drift: Drift) -> None:
+    print(json.dumps(drift.as_dict()), flush=True)
+
+
+async def main(chunk_size: int, dry_run: bool) -> None:
+    async with AsyncSessionLocal() as session:
+        report = await reconcile(session, chunk_size, dry_run, print_drift)
+        if not dry_run:
+            await session.commit()
+    print(json.dumps({
+        'dry_run': dry_run,
+        'checked': report.checked,
+        'drifted': report.drifted,
+    }), flush=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        '--dry-run', action='store_true',
+        help='only report the drifted rows, do not write anything',
+    )
+    parser.add_argument(
+        '--chunk-size', type=int, default=10000,
+        help='rows fetched per cursor round trip and updated per batch',
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args.chunk_size, args.dry_run))
@@ -1,3 +1,5 @@
 """Base class and all models import for Alembic."""
 from app.core.db import Base  # noqa
-from app.models import CharityProject, Donation, User  # noqa
+from app.models import (CharityProject, Donation,  # noqa
+                        DonationAllocation, DonationIntake, FundStats,
+                        ImportCheckpoint, User)
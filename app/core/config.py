@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Literal, Optional
 
 from pydantic import BaseSettings, EmailStr
 
@@ -6,9 +6,34 @@ from pydantic import BaseSettings, EmailStr
 class Settings(BaseSettings):
     app_title: str = 'Cat charity fund'
     database_url: str = 'sqlite+aiosqlite:///./fastapi.db'
+    read_replica_url: Optional[str] = None
     secret: str = 'SECRET'
     first_superuser_email: Optional[EmailStr] = None
     first_superuser_password: Optional[str] = None
+    investment_mode: Literal['orm', 'memory', 'sql'] = 'orm'
+    investment_retries: int = 5
+    engine_wal: bool = True
+    engine_synchronous: Literal['OFF', 'NORMAL', 'FULL'] = 'NORMAL'
+    engine_busy_timeout: int = 5000
+    engine_statement_timeout: Optional[int] = None
+    engine_pool_size: int = 5
+    engine_max_overflow: int = 10
+    engine_pool_recycle: int = 1800
+    session_expire_on_commit: bool = False
+    auth_cache_ttl: int = 5
+    auth_cache_size: int = 10000
+    password_hash_executor: Literal['inline', 'thread', 'process'] = 'thread'
+    password_hash_workers: int = 4
+    password_hash_concurrency: int = 4
+    project_list_cache_ttl: int = 5
+    project_list_cache_size: int = 128
+    sql_timing: bool = False
+    donation_intake: Literal['sync', 'async'] = 'sync'
+    intake_batch_size: int = 500
+    intake_interval: float = 1.0
+    group_commit: bool = False
+    group_commit_window: float = 0.002
+    group_commit_size: int = 64
 
     class Config:
         env_file = '.env'
@@ -1,8 +1,15 @@
-from sqlalchemy import Column, Integer
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+import time
+from typing import Dict
+
+from sqlalchemy import Column, Integer, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import (AsyncEngine, AsyncSession,
+                                    create_async_engine)
 from sqlalchemy.orm import declarative_base, declared_attr, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from app.core.config import settings
+from app.core.metrics import pool_checkout_wait
 
 
 class PreBase:
@@ -13,15 +20,153 @@ class PreBase:
 
     id = Column(Integer, primary_key=True)
 
+    def fund_stats(self) -> Dict[str, int]:
+        """Contribution of the object to the fund statistics."""
+        return {}
+
 
 Base = declarative_base(cls=PreBase)
 
-engine = create_async_engine(settings.database_url)
 
-AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession)
+class MeteredQueuePool(AsyncAdaptedQueuePool):
+    """Connection pool reporting how long checkouts wait."""
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            pool_checkout_wait.observe(time.perf_counter() - started)
+
+
+def engine_options(database_url: str, read_only: bool = False) -> dict:
+    """Engine keyword arguments of the profile configured in the settings."""
+    options = dict(
+        pool_size=settings.engine_pool_size,
+        max_overflow=settings.engine_max_overflow,
+        pool_recycle=settings.engine_pool_recycle,
+        poolclass=MeteredQueuePool,
+    )
+    url = make_url(database_url)
+    if url.get_backend_name() == 'sqlite':
+        # File databases get NullPool by default, the queue pool keeps
+        # connections instead.
+        options['connect_args'] = {
+            'timeout': settings.engine_busy_timeout / 1000
+        }
+    else:
+        # Local SQLite connections cannot drop, network ones can: check
+        # them on checkout instead of failing the first query.
+        options['pool_pre_ping'] = True
+    if url.get_driver_name() == 'asyncpg':
+        server_settings = {}
+        if settings.engine_statement_timeout is not None:
+            server_settings['statement_timeout'] = str(
+                settings.engine_statement_timeout
+            )
+        if read_only:
+            server_settings['default_transaction_read_only'] = 'on'
+        if server_settings:
+            options['connect_args'] = {'server_settings': server_settings}
+    return options
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """Journal, durability and lock waiting settings for a new connection."""
+    cursor = dbapi_connection.cursor()
+    if settings.engine_wal:
+        cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute(f'PRAGMA synchronous={settings.engine_synchronous}')
+    cursor.execute(f'PRAGMA busy_timeout={settings.engine_busy_timeout}')
+    cursor.close()
+    if settings.engine_statement_timeout is not None:
+        # SQLite has no statement timeout: a progress handler interrupts
+        # statements running past the deadline set before execution.
+        info = connection_record.info
+
+        def interrupt_expired() -> int:
+            return time.monotonic() > info.get('deadline', float('inf'))
+
+        dbapi_connection.await_(
+            dbapi_connection.driver_connection.set_progress_handler(
+                interrupt_expired, 1000
+            )
+        )
+
+
+def set_query_only(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA query_only=ON')
+    cursor.close()
+
+
+def start_statement_timer(conn, cursor, statement, parameters, context,
+                          executemany) -> None:
+    conn.info['deadline'] = (
+        time.monotonic() + settings.engine_statement_timeout / 1000
+    )
+
+
+def stop_statement_timer(conn, cursor, statement, parameters, context,
+                         executemany) -> None:
+    conn.info.pop('deadline', None)
+
+
+def create_tuned_engine(
+    database_url: str, read_only: bool = False
+) -> AsyncEngine:
+    """
+    Async engine tuned with the profile configured in the settings.
+    Connections of a `read_only` engine refuse writes.
+    """
+    engine = create_async_engine(
+        database_url, **engine_options(database_url, read_only)
+    )
+    if engine.dialect.name == 'sqlite':
+        event.listen(engine.sync_engine, 'connect', set_sqlite_pragmas)
+        if read_only:
+            event.listen(engine.sync_engine, 'connect', set_query_only)
+        if settings.engine_statement_timeout is not None:
+            event.listen(
+                engine.sync_engine, 'before_cursor_execute',
+                start_statement_timer
+            )
+            event.listen(
+                engine.sync_engine, 'after_cursor_execute',
+                stop_statement_timer
+            )
+    return engine
+
+
+engine = create_tuned_engine(settings.database_url)
+# In the WAL journal the readers never wait for the writer's lock.
+read_engine = create_tuned_engine(
+    settings.read_replica_url or settings.database_url, read_only=True
+)
+
+AsyncSessionLocal = sessionmaker(
+    engine,
+    class_=AsyncSession,
+    expire_on_commit=settings.session_expire_on_commit,
+)
+ReadSessionLocal = sessionmaker(
+    read_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=settings.session_expire_on_commit,
+)
 
 
 async def get_async_session():
     """Asynchronous session generator."""
     async with AsyncSessionLocal() as async_session:
         yield async_session
+
+
+async def get_read_session():
+    """
+    Session of the GET endpoints, on the read-only engine (the replica at
+    READ_REPLICA_URL when it is set).
+    """
+    async with ReadSessionLocal() as async_session:
+        yield async_session
@@ -0,0 +1,195 @@
+"""
+In-process metrics rendered in the Prometheus text format.
+
+All updates happen on the event loop thread, so the collectors are plain
+dicts and lists without locks; a sample costs a dict lookup and an add.
+"""
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+ROWS_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 1000)
+
+
+def format_labels(names: Sequence[str], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ''
+    pairs = (
+        '{}="{}"'.format(name, str(value).replace('\\', r'\\').replace(
+            '"', r'\"').replace('\n', r'\n'))
+        for name, value in zip(names, values)
+    )
+    return '{' + ','.join(pairs) + '}'
+
+
+class Metric:
+    type = 'untyped'
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[Tuple[str, ...], object] = {}
+
+    def header(self) -> Iterator[str]:
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} {self.type}'
+
+    def render(self) -> Iterator[str]:
+        yield from self.header()
+        for labels, value in self.values.items():
+            yield (
+                f'{self.name}{format_labels(self.labelnames, labels)} {value}'
+            )
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+
+class Gauge(Counter):
+    type = 'gauge'
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels: str) -> None:
+        # Per-bucket counts (the last one is +Inf) followed by the sum.
+        counts = self.values.get(labels)
+        if counts is None:
+            counts = self.values[labels] = [0] * (len(self.buckets) + 1)
+            counts.append(0)
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def render(self) -> Iterator[str]:
+        yield from self.header()
+        bounds = [*map(repr, map(float, self.buckets)), '+Inf']
+        for labels, counts in self.values.items():
+            total = 0
+            for bound, count in zip(bounds, counts):
+                total += count
+                bucket_labels = format_labels(
+                    (*self.labelnames, 'le'), (*labels, bound)
+                )
+                yield f'{self.name}_bucket{bucket_labels} {total}'
+            labels_text = format_labels(self.labelnames, labels)
+            yield f'{self.name}_sum{labels_text} {counts[-1]}'
+            yield f'{self.name}_count{labels_text} {total}'
+
+
+class Registry:
+
+    def __init__(self) -> None:
+        self.metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return ''.join(
+            f'{line}\n' for metric in self.metrics for line in metric.render()
+        )
+
+
+registry = Registry()
+request_latency = registry.register(Histogram(
+    'http_request_duration_seconds',
+    'HTTP request latency by route template.',
+    ('method', 'route'),
+))
+requests_total = registry.register(Counter(
+    'http_requests_total',
+    'HTTP responses by route template and status code.',
+    ('method', 'route', 'status'),
+))
+requests_in_progress = registry.register(Gauge(
+    'http_requests_in_progress', 'HTTP requests being handled.',
+))
+pool_checkout_wait = registry.register(Histogram(
+    'db_pool_checkout_seconds',
+    'Time to check a connection out of the database pool.',
+))
+allocation_rows = registry.register(Histogram(
+    'allocation_rows_touched',
+    'Open projects/donations updated by one allocation.',
+    buckets=ROWS_BUCKETS,
+))
+projects_closed = registry.register(Counter(
+    'allocation_projects_closed_total',
+    'Projects fully invested by allocations.',
+))
+# Metrics without labels are exported from the start.
+requests_in_progress.inc(amount=0)
+projects_closed.inc(amount=0)
+
+
+class MetricsMiddleware:
+    """Latency, status and in-flight metrics of the HTTP requests."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self.templates: Dict[Callable, str] = {}
+
+    def route_template(self, scope: Scope) -> str:
+        endpoint = scope.get('endpoint')
+        if endpoint is None:
+            return 'unmatched'
+        if endpoint not in self.templates:
+            self.templates.update(
+                (route.endpoint, route.path)
+                for route in scope['app'].routes
+                if hasattr(route, 'endpoint')
+            )
+        return self.templates.get(endpoint, 'unmatched')
+
+    async def __call__(
+        self, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        requests_in_progress.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            requests_in_progress.dec()
+            route = self.route_template(scope)
+            request_latency.observe(
+                time.perf_counter() - started, scope['method'], route
+            )
+            requests_total.inc(scope['method'], route, str(status_code))
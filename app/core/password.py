@@ -0,0 +1,81 @@
+import asyncio
+from concurrent.futures import (Executor, ProcessPoolExecutor,
+                                ThreadPoolExecutor)
+from typing import Any, Callable, Optional, Tuple
+from weakref import WeakKeyDictionary
+
+from fastapi_users.password import PasswordHelper
+
+from app.core.config import settings
+
+password_helper = PasswordHelper()
+
+
+def hash_password(password: str) -> str:
+    return password_helper.hash(password)
+
+
+def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    return password_helper.verify_and_update(plain_password, hashed_password)
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt hashing and verification off the event loop, in a thread or
+    process pool, with at most `concurrency` operations at a time.
+    """
+
+    def __init__(self, executor: str, workers: int, concurrency: int) -> None:
+        self.executor_type = executor
+        self.workers = workers
+        self.concurrency = concurrency
+        self._executor: Optional[Executor] = None
+        self._semaphores = WeakKeyDictionary()
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            executor_class = (
+                ProcessPoolExecutor if self.executor_type == 'process'
+                else ThreadPoolExecutor
+            )
+            self._executor = executor_class(max_workers=self.workers)
+        return self._executor
+
+    def semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if loop not in self._semaphores:
+            self._semaphores[loop] = asyncio.Semaphore(self.concurrency)
+        return self._semaphores[loop]
+
+    async def run(self, func: Callable, *args) -> Any:
+        if self.executor_type == 'inline':
+            return func(*args)
+        async with self.semaphore():
+            return await asyncio.get_running_loop().run_in_executor(
+                self.executor, func, *args
+            )
+
+    async def hash(self, password: str) -> str:
+        return await self.run(hash_password, password)
+
+    async def verify_and_update(
+        self, plain_password: str, hashed_password: str
+    ) -> Tuple[bool, Optional[str]]:
+        return await self.run(
+            verify_and_update_password, plain_password, hashed_password
+        )
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    settings.password_hash_executor,
+    settings.password_hash_workers,
+    settings.password_hash_concurrency,
+)
@@ -0,0 +1,101 @@
+"""Per-request count and duration of the SQL statements (opt-in)."""
+import logging
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+logger = logging.getLogger('app.access')
+
+
+class SQLTiming:
+    """Statements executed while handling one request."""
+
+    __slots__ = ('statements', 'seconds')
+
+    def __init__(self) -> None:
+        self.statements = 0
+        self.seconds = 0.0
+
+    def server_timing(self) -> str:
+        return (
+            f'db;dur={self.seconds * 1000:.2f};'
+            f'desc="{self.statements} statements"'
+        )
+
+
+request_timing: ContextVar[Optional[SQLTiming]] = ContextVar(
+    'request_timing', default=None
+)
+
+
+def start_timing(conn, cursor, statement, parameters, context,
+                 executemany) -> None:
+    if request_timing.get() is not None:
+        conn.info.setdefault('sql_timing', []).append(time.perf_counter())
+
+
+def stop_timing(conn, cursor, statement, parameters, context,
+                executemany) -> None:
+    timing = request_timing.get()
+    if timing is not None and conn.info.get('sql_timing'):
+        timing.statements += 1
+        timing.seconds += time.perf_counter() - conn.info['sql_timing'].pop()
+
+
+def instrument(engine: AsyncEngine) -> None:
+    """Count the statements of the engine in the current request."""
+    for name, listener in (
+        ('before_cursor_execute', start_timing),
+        ('after_cursor_execute', stop_timing),
+    ):
+        if not event.contains(engine.sync_engine, name, listener):
+            event.listen(engine.sync_engine, name, listener)
+
+
+class SQLTimingMiddleware:
+    """
+    Adds a Server-Timing header with the statements count and database time
+    of the request and writes them to the `app.access` log.
+    Enabled with the SQL_TIMING setting.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(
+        self, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        if scope['type'] != 'http' or not settings.sql_timing:
+            await self.app(scope, receive, send)
+            return
+        timing = SQLTiming()
+        token = request_timing.set(timing)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+                MutableHeaders(scope=message).append(
+                    'Server-Timing', timing.server_timing()
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            request_timing.reset(token)
+            logger.info(
+                '%s %s %s %d statements %.2fms db %.2fms total',
+                scope['method'], scope['path'], status_code,
+                timing.statements, timing.seconds * 1000,
+                (time.perf_counter() - started) * 1000,
+            )
@@ -1,15 +1,23 @@
-from typing import Optional, Union
+import hashlib
+import time
+from typing import Any, Dict, Optional, Union
 
+import jwt
 from fastapi import Depends, Request
+from fastapi.security import OAuth2PasswordRequestForm
 from fastapi_users import (BaseUserManager, FastAPIUsers, IntegerIDMixin,
-                           InvalidPasswordException)
+                           InvalidPasswordException, exceptions)
 from fastapi_users.authentication import (AuthenticationBackend,
                                           BearerTransport, JWTStrategy)
+from fastapi_users.jwt import decode_jwt
 from fastapi_users_db_sqlalchemy import SQLAlchemyUserDatabase
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 
+from app.core.cache import TTLCache
 from app.core.config import settings
 from app.core.db import get_async_session
+from app.core.password import password_hasher
 from app.models.user import User
 from app.schemas.user import UserCreate
 
@@ -20,9 +28,55 @@ async def get_user_db(session: AsyncSession = Depends(get_async_session)):
 
 bearer_transport = BearerTransport(tokenUrl='auth/jwt/login')
 
+# Token hash -> user id and user id -> user columns. The caches are per
+# process: user updates invalidate them only in the worker that made them,
+# other workers see the change once AUTH_CACHE_TTL expires.
+token_cache = TTLCache(settings.auth_cache_size, settings.auth_cache_ttl)
+user_cache = TTLCache(settings.auth_cache_size, settings.auth_cache_ttl)
+
+
+class CachedJWTStrategy(JWTStrategy):
+    """
+    JWT strategy that caches decoded tokens and resolved users, so an
+    authenticated request does not hit the user table every time.
+    """
+
+    async def read_token(
+        self, token: Optional[str], user_manager: BaseUserManager
+    ) -> Optional[User]:
+        if token is None:
+            return None
+        token_key = hashlib.sha256(token.encode()).hexdigest()
+        user_id = token_cache.get(token_key)
+        if user_id is None:
+            try:
+                data = decode_jwt(
+                    token, self.decode_key, self.token_audience,
+                    algorithms=[self.algorithm],
+                )
+                user_id = user_manager.parse_id(data['user_id'])
+            except (jwt.PyJWTError, KeyError, exceptions.InvalidID):
+                return None
+            expires_in = data.get('exp', float('inf')) - time.time()
+            token_cache.set(token_key, user_id, ttl=expires_in)
+        user_data = user_cache.get(user_id)
+        if user_data is not None:
+            user = User(**user_data)
+            make_transient_to_detached(user)
+            return user
+        try:
+            user = await user_manager.get(user_id)
+        except exceptions.UserNotExists:
+            return None
+        user_cache.set(user_id, {
+            column.key: getattr(user, column.key)
+            for column in User.__table__.columns
+        })
+        return user
+
 
 def get_jwt_strategy() -> JWTStrategy:
-    return JWTStrategy(secret=settings.secret, lifetime_seconds=3600)
+    return CachedJWTStrategy(secret=settings.secret, lifetime_seconds=3600)
 
 
 auth_backend = AuthenticationBackend(
@@ -44,11 +98,83 @@ class UserManager(IntegerIDMixin, BaseUserManager[User, int]):
                 reason='Password should not contain e-mail'
             )
 
+    async def create(
+        self,
+        user_create: UserCreate,
+        safe: bool = False,
+        request: Optional[Request] = None,
+    ) -> User:
+        """Create a user, hashing the password off the event loop."""
+        await self.validate_password(user_create.password, user_create)
+        existing_user = await self.user_db.get_by_email(user_create.email)
+        if existing_user is not None:
+            raise exceptions.UserAlreadyExists()
+        user_dict = (
+            user_create.create_update_dict()
+            if safe
+            else user_create.create_update_dict_superuser()
+        )
+        password = user_dict.pop('password')
+        user_dict['hashed_password'] = await password_hasher.hash(password)
+        created_user = await self.user_db.create(user_dict)
+        await self.on_after_register(created_user, request)
+        return created_user
+
+    async def authenticate(
+        self, credentials: OAuth2PasswordRequestForm
+    ) -> Optional[User]:
+        """Check credentials, verifying the password off the event loop."""
+        try:
+            user = await self.get_by_email(credentials.username)
+        except exceptions.UserNotExists:
+            # Run the hasher anyway to mitigate timing attacks.
+            await password_hasher.hash(credentials.password)
+            return None
+        verified, updated_password_hash = (
+            await password_hasher.verify_and_update(
+                credentials.password, user.hashed_password
+            )
+        )
+        if not verified:
+            return None
+        if updated_password_hash is not None:
+            await self.user_db.update(
+                user, {'hashed_password': updated_password_hash}
+            )
+        return user
+
+    async def _update(self, user: User, update_dict: Dict[str, Any]) -> User:
+        if 'password' in update_dict:
+            password = update_dict.pop('password')
+            await self.validate_password(password, user)
+            update_dict['hashed_password'] = await password_hasher.hash(
+                password
+            )
+        return await super()._update(user, update_dict)
+
     async def on_after_register(
         self, user: User, request: Optional[Request] = None
     ):
         print(f'{user.email} is registered.')
 
+    async def on_after_update(
+        self,
+        user: User,
+        update_dict: Dict[str, Any],
+        request: Optional[Request] = None,
+    ):
+        user_cache.pop(user.id)
+
+    async def on_after_verify(
+        self, user: User, request: Optional[Request] = None
+    ):
+        user_cache.pop(user.id)
+
+    async def on_after_reset_password(
+        self, user: User, request: Optional[Request] = None
+    ):
+        user_cache.pop(user.id)
+
 
 async def get_user_manager(user_db=Depends(get_user_db)):
     yield UserManager(user_db)
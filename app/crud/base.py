@@ -1,17 +1,28 @@
-from typing import Generic, List, Optional, Type, TypeVar
+from types import SimpleNamespace
+from typing import (AsyncIterator, Generic, Iterable, List, Optional,
+                    Sequence, Type, TypeVar)
 
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
-from sqlalchemy import asc, select
+from sqlalchemy import asc, case, func, inspect, select, update
+from sqlalchemy.engine import Row
+from sqlalchemy.sql import Select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
+from sqlalchemy.orm.exc import StaleDataError
 
+from app.core.cache import data_version
 from app.core.db import Base
+from app.crud.fund_stats import fund_stats_crud, stats_diff
 from app.models import User
 
 ModelType = TypeVar('ModelType', bound=Base)
 CreateSchemaType = TypeVar('CreateSchemaType', bound=BaseModel)
 UpdateSchemaType = TypeVar('UpdateSchemaType', bound=BaseModel)
 
+# Open objects in the first window of get_open_for_amount.
+OPEN_PAGE_SIZE = 32
+
 
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
 
@@ -26,33 +37,216 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         )
         return db_obj.scalars().first()
 
-    async def get_multi(self, session: AsyncSession) -> List[ModelType]:
-        db_objs = await session.execute(select(self.model))
+    def paginate(
+        self,
+        query: Select,
+        limit: Optional[int] = None,
+        after: Optional[int] = None,
+    ) -> Select:
+        """Keyset pagination: objects with id greater than `after`."""
+        if after is not None:
+            query = query.where(self.model.id > after)
+        return query.order_by(self.model.id).limit(limit)
+
+    def select_columns(
+        self, columns: Optional[Sequence[str]] = None
+    ) -> Select:
+        """Objects with only `columns` loaded, the others deferred."""
+        query = select(self.model)
+        if columns is not None:
+            query = query.options(load_only(*columns))
+        return query
+
+    async def get_multi(
+        self,
+        session: AsyncSession,
+        limit: Optional[int] = None,
+        after: Optional[int] = None,
+        columns: Optional[Sequence[str]] = None,
+    ) -> List[ModelType]:
+        db_objs = await session.execute(
+            self.paginate(self.select_columns(columns), limit, after)
+        )
         return db_objs.scalars().all()
 
+    async def get_multi_rows(
+        self,
+        session: AsyncSession,
+        columns: Sequence[str],
+        limit: Optional[int] = None,
+        after: Optional[int] = None,
+    ) -> List[Row]:
+        """Page of column tuples, without loading the ORM objects."""
+        rows = await session.execute(self.paginate(
+            select(*(getattr(self.model, column) for column in columns)),
+            limit,
+            after,
+        ))
+        return rows.all()
+
+    async def stream_multi(
+        self,
+        session: AsyncSession,
+        limit: Optional[int] = None,
+        after: Optional[int] = None,
+        columns: Optional[Sequence[str]] = None,
+    ) -> AsyncIterator[ModelType]:
+        """Yield objects as they arrive from the database."""
+        db_objs = await session.stream(
+            self.paginate(self.select_columns(columns), limit, after)
+        )
+        async for db_obj in db_objs.scalars():
+            yield db_obj
+
     async def get_multi_open(self, session: AsyncSession) -> List[ModelType]:
         db_objs = await session.execute(
             select(self.model).where(
                 self.model.fully_invested.is_(False)
-            ).order_by(asc('create_date'))
+            ).order_by(asc('create_date'), self.model.id)
         )
         return db_objs.scalars().all()
 
+    async def get_open_for_amount(
+        self, amount: int, session: AsyncSession
+    ) -> List[Row]:
+        """
+        The FIFO prefix of open objects needed to absorb `amount`.
+        Only the first `limit` open objects are read in index order and
+        the database computes running totals of their remaining amounts
+        with a window function; the limit is doubled until the amount is
+        absorbed, so the work depends on the prefix, not on the backlog.
+        """
+        limit = OPEN_PAGE_SIZE
+        while True:
+            page = select(
+                self.model.id,
+                self.model.full_amount,
+                self.model.invested_amount,
+                self.model.version,
+                self.model.create_date,
+                (
+                    self.model.full_amount - self.model.invested_amount
+                ).label('remaining'),
+            ).where(self.model.fully_invested.is_(False)).order_by(
+                self.model.create_date, self.model.id
+            ).limit(limit).subquery()
+            open_objs = select(
+                page,
+                func.sum(page.c.remaining).over(
+                    order_by=(page.c.create_date, page.c.id)
+                ).label('running_total'),
+            ).subquery()
+            db_objs = (await session.execute(
+                select(
+                    open_objs.c.id,
+                    open_objs.c.full_amount,
+                    open_objs.c.invested_amount,
+                    open_objs.c.version,
+                    open_objs.c.create_date,
+                ).where(
+                    open_objs.c.running_total - open_objs.c.remaining < amount
+                ).order_by(open_objs.c.running_total)
+            )).all()
+            # A prefix shorter than the page either absorbs the amount or
+            # is the whole backlog.
+            if len(db_objs) < limit:
+                return db_objs
+            limit *= 2
+
+    async def save_invested(
+        self, db_objs: Iterable, session: AsyncSession
+    ) -> None:
+        """
+        Set-based write back of an allocation: all closed objects are updated
+        by one statement, the partially invested one by another. The close
+        dates and durations stamped by the allocation are matched by id.
+        Raises StaleDataError if any of them was changed concurrently.
+        """
+        closed = [obj for obj in db_objs if obj.fully_invested]
+        partial = [obj for obj in db_objs if not obj.fully_invested]
+        statements = []
+        if closed:
+            statements.append((
+                # A row value IN list scans the table in SQLite, the
+                # id IN list is a primary key search.
+                update(self.model.__table__).where(
+                    self.model.id.in_([obj.id for obj in closed]),
+                    self.model.version == case(
+                        {obj.id: obj.version for obj in closed},
+                        value=self.model.id,
+                    ),
+                ).values(
+                    invested_amount=self.model.full_amount,
+                    fully_invested=True,
+                    close_date=case(
+                        {obj.id: obj.close_date for obj in closed},
+                        value=self.model.id,
+                    ),
+                    duration=case(
+                        {obj.id: obj.duration for obj in closed},
+                        value=self.model.id,
+                    ),
+                    version=self.model.version + 1,
+                ),
+                len(closed),
+            ))
+        for obj in partial:
+            statements.append((
+                update(self.model.__table__).where(
+                    self.model.id == obj.id,
+                    self.model.version == obj.version,
+                ).values(
+                    invested_amount=obj.invested_amount,
+                    version=self.model.version + 1,
+                ),
+                1,
+            ))
+        for statement, expected in statements:
+            result = await session.execute(statement)
+            if result.rowcount != expected:
+                raise StaleDataError(
+                    f'{self.model.__tablename__}: {expected - result.rowcount}'
+                    f' of {expected} rows were changed concurrently'
+                )
+
     async def create(
         self,
         obj_in: CreateSchemaType,
         session: AsyncSession,
-        user: Optional[User] = None
+        user: Optional[User] = None,
+        commit: bool = True,
     ) -> ModelType:
         obj_in_data = obj_in.dict()
         if user is not None:
             obj_in_data['user_id'] = user.id
         db_obj = self.model(**obj_in_data)
         session.add(db_obj)
-        await session.commit()
-        await session.refresh(db_obj)
+        if commit:
+            await session.flush()
+            await fund_stats_crud.add(
+                db_obj.fund_stats(), session, new_objs=(db_obj,)
+            )
+            await session.commit()
+            data_version.bump()
+            await self.refresh_expired(db_obj, session)
         return db_obj
 
+    async def create_multi(
+        self,
+        objs_in: List[CreateSchemaType],
+        session: AsyncSession,
+        user: Optional[User] = None
+    ) -> List[ModelType]:
+        """Add several objects to the session without flushing them."""
+        db_objs = []
+        for obj_in in objs_in:
+            obj_in_data = obj_in.dict()
+            if user is not None:
+                obj_in_data['user_id'] = user.id
+            db_objs.append(self.model(**obj_in_data))
+        session.add_all(db_objs)
+        return db_objs
+
     async def update(
         self,
         db_obj: ModelType,
@@ -65,13 +259,45 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             if field in update_data:
                 setattr(db_obj, field, update_data[field])
         session.add(db_obj)
+        await fund_stats_crud.add(
+            stats_diff(
+                db_obj.fund_stats(),
+                self.model.fund_stats(self.committed_state(db_obj)),
+            ),
+            session,
+        )
         await session.commit()
-        await session.refresh(db_obj)
+        data_version.bump()
+        await self.refresh_expired(db_obj, session)
         return db_obj
 
+    @staticmethod
+    def committed_state(db_obj: ModelType) -> SimpleNamespace:
+        """Attribute values of the object as last loaded/flushed."""
+        state = inspect(db_obj)
+        values = {}
+        for attr in state.mapper.column_attrs:
+            history = state.attrs[attr.key].history
+            values[attr.key] = (
+                history.deleted[0] if history.deleted
+                else getattr(db_obj, attr.key)
+            )
+        return SimpleNamespace(**values)
+
+    async def refresh_expired(
+        self, db_obj: ModelType, session: AsyncSession
+    ) -> None:
+        """Reload the object only if the session expired it on commit."""
+        if session.sync_session.expire_on_commit:
+            await session.refresh(db_obj)
+
     async def remove(
         self, db_obj: ModelType, session: AsyncSession
     ) -> ModelType:
         await session.delete(db_obj)
+        await fund_stats_crud.add(
+            stats_diff({}, db_obj.fund_stats()), session
+        )
         await session.commit()
+        data_version.bump()
         return db_obj
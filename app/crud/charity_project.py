@@ -1,23 +1,104 @@
-from typing import Optional
+from datetime import datetime
+from typing import List, Optional
 
-from sqlalchemy import select
+from sqlalchemy import and_, case, or_, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.cache import data_version
 from app.crud.base import CRUDBase
+from app.crud.fund_stats import fund_stats_crud
 from app.models import CharityProject
+from app.schemas.charity_project import CharityProjectUpdate
 
 
 class CRUDCharityProject(CRUDBase):
 
-    async def get_project_id_by_name(
-        self, project_name: str, session: AsyncSession,
-    ) -> Optional[int]:
-        db_project_id = await session.execute(
-            select(CharityProject.id).where(
-                CharityProject.name == project_name
+    async def update_open(
+        self,
+        project_id: int,
+        obj_in: CharityProjectUpdate,
+        session: AsyncSession,
+    ) -> Optional[CharityProject]:
+        """
+        Update an open project with a single conditional UPDATE, closing it
+        if the new full amount equals the invested one. Returns None if the
+        project does not exist, is closed or has more funds invested than
+        the new full amount. The unique name is checked by the database.
+        """
+        update_data = {
+            field: value
+            for field, value in obj_in.dict(exclude_unset=True).items()
+            if value is not None
+        }
+        query = update(CharityProject).where(
+            CharityProject.id == project_id,
+            CharityProject.fully_invested.is_(False),
+        )
+        if 'full_amount' in update_data:
+            full_amount = update_data['full_amount']
+            closes = CharityProject.invested_amount == full_amount
+            query = query.where(CharityProject.invested_amount <= full_amount)
+            update_data.update(
+                fully_invested=case((closes, True), else_=False),
+                close_date=case((closes, datetime.now()), else_=None),
+            )
+        query = query.values(
+            **update_data, version=CharityProject.version + 1
+        ).execution_options(synchronize_session=False)
+        if session.bind.dialect.full_returning:
+            result = await session.execute(
+                select(CharityProject).from_statement(
+                    query.returning(*CharityProject.__table__.c)
+                ).execution_options(populate_existing=True)
+            )
+            db_obj = result.scalars().first()
+        else:
+            result = await session.execute(query)
+            db_obj = None if result.rowcount == 0 else await session.get(
+                CharityProject, project_id, populate_existing=True
             )
+        if db_obj is None:
+            return None
+        if db_obj.fully_invested:
+            db_obj.duration = int(
+                (db_obj.close_date - db_obj.create_date).total_seconds()
+            )
+            await fund_stats_crud.add(
+                {'open_projects': -1, 'closed_projects': 1}, session
+            )
+        await session.commit()
+        data_version.bump()
+        await self.refresh_expired(db_obj, session)
+        return db_obj
+
+    async def get_fastest_closed(
+        self,
+        session: AsyncSession,
+        limit: Optional[int] = None,
+        after: Optional[int] = None,
+    ) -> List[CharityProject]:
+        """
+        Closed projects ordered by how fast they were funded.
+        Keyset pagination continues after the project with id `after`.
+        """
+        query = select(CharityProject).where(
+            CharityProject.fully_invested.is_(True)
         )
-        return db_project_id.scalars().first()
+        if after is not None:
+            last = select(CharityProject.duration).where(
+                CharityProject.id == after
+            ).scalar_subquery()
+            query = query.where(or_(
+                CharityProject.duration > last,
+                and_(
+                    CharityProject.duration == last,
+                    CharityProject.id > after,
+                ),
+            ))
+        db_objs = await session.execute(query.order_by(
+            CharityProject.duration, CharityProject.id
+        ).limit(limit))
+        return db_objs.scalars().all()
 
 
 charity_project_crud = CRUDCharityProject(CharityProject)
@@ -1,4 +1,4 @@
-from typing import List
+from typing import AsyncIterator, List, Optional
 
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -10,12 +10,29 @@ from app.models import Donation, User
 class CRUDDonation(CRUDBase):
 
     async def get_by_user(
-        self, session: AsyncSession, user: User
+        self,
+        session: AsyncSession,
+        user: User,
+        limit: Optional[int] = None,
+        after: Optional[int] = None,
     ) -> List[Donation]:
-        donations = await session.execute(
-            select(Donation).where(Donation.user_id == user.id)
-        )
+        donations = await session.execute(self.paginate(
+            select(Donation).where(Donation.user_id == user.id), limit, after
+        ))
         return donations.scalars().all()
 
+    async def stream_by_user(
+        self,
+        session: AsyncSession,
+        user: User,
+        limit: Optional[int] = None,
+        after: Optional[int] = None,
+    ) -> AsyncIterator[Donation]:
+        donations = await session.stream(self.paginate(
+            select(Donation).where(Donation.user_id == user.id), limit, after
+        ))
+        async for donation in donations.scalars():
+            yield donation
+
 
 donation_crud = CRUDDonation(Donation)
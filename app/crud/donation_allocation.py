@@ -0,0 +1,65 @@
+from datetime import datetime
+from typing import Iterable, List, Tuple
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.base import CRUDBase
+from app.models import DonationAllocation
+
+# Rows per INSERT, well below the bound parameters limit of SQLite.
+INSERT_CHUNK_SIZE = 1000
+
+
+class CRUDDonationAllocation(CRUDBase):
+
+    async def record(
+        self,
+        allocations: Iterable[Tuple[int, int, int]],
+        session: AsyncSession,
+    ) -> None:
+        """
+        Write (donation_id, project_id, amount) entries of one allocation
+        with a multi-row INSERT, in the caller's transaction.
+        """
+        created_at = datetime.now()
+        rows = [
+            {
+                'donation_id': donation_id,
+                'project_id': project_id,
+                'amount': amount,
+                'created_at': created_at,
+            }
+            for donation_id, project_id, amount in allocations
+        ]
+        for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+            await session.execute(
+                insert(DonationAllocation).values(
+                    rows[start:start + INSERT_CHUNK_SIZE]
+                )
+            )
+
+    async def get_by_project(
+        self, project_id: int, session: AsyncSession
+    ) -> List[DonationAllocation]:
+        """Donations behind the project, in allocation order."""
+        db_objs = await session.execute(
+            select(DonationAllocation).where(
+                DonationAllocation.project_id == project_id
+            ).order_by(DonationAllocation.donation_id)
+        )
+        return db_objs.scalars().all()
+
+    async def get_by_donation(
+        self, donation_id: int, session: AsyncSession
+    ) -> List[DonationAllocation]:
+        """Projects funded by the donation, in allocation order."""
+        db_objs = await session.execute(
+            select(DonationAllocation).where(
+                DonationAllocation.donation_id == donation_id
+            ).order_by(DonationAllocation.project_id)
+        )
+        return db_objs.scalars().all()
+
+
+donation_allocation_crud = CRUDDonationAllocation(DonationAllocation)
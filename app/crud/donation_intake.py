@@ -0,0 +1,80 @@
+from typing import Dict, List, Optional
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.exc import StaleDataError
+
+from app.crud.base import CRUDBase
+from app.models import DonationIntake, User
+from app.schemas.donation import DonationCreate
+
+
+class CRUDDonationIntake(CRUDBase):
+
+    async def create(
+        self,
+        obj_in: DonationCreate,
+        session: AsyncSession,
+        user: Optional[User] = None,
+    ) -> DonationIntake:
+        """
+        Store an accepted donation. Neither the projects nor the fund
+        statistics change until the worker allocates it, so the data
+        version is left to the worker and cached lists stay valid.
+        """
+        db_obj = DonationIntake(
+            **obj_in.dict(), user_id=None if user is None else user.id
+        )
+        session.add(db_obj)
+        await session.commit()
+        await self.refresh_expired(db_obj, session)
+        return db_obj
+
+    async def get_by_user(
+        self, intake_id: int, user: User, session: AsyncSession
+    ) -> Optional[DonationIntake]:
+        db_obj = await session.execute(
+            select(DonationIntake).where(
+                DonationIntake.id == intake_id,
+                DonationIntake.user_id == user.id,
+            )
+        )
+        return db_obj.scalars().first()
+
+    async def get_pending(
+        self, limit: int, session: AsyncSession
+    ) -> List[DonationIntake]:
+        """The oldest intakes not allocated yet."""
+        db_objs = await session.execute(
+            select(DonationIntake).where(
+                DonationIntake.donation_id.is_(None)
+            ).order_by(DonationIntake.id).limit(limit)
+        )
+        return db_objs.scalars().all()
+
+    async def link_donations(
+        self, donation_ids: Dict[int, int], session: AsyncSession
+    ) -> None:
+        """
+        Record the donations created from the intakes.
+        Raises StaleDataError if another worker has already taken any of them.
+        """
+        table = DonationIntake.__table__
+        result = await session.execute(
+            update(table).where(
+                table.c.id == bindparam('intake_id'),
+                table.c.donation_id.is_(None),
+            ).values(donation_id=bindparam('new_donation_id')),
+            [
+                {'intake_id': intake_id, 'new_donation_id': donation_id}
+                for intake_id, donation_id in donation_ids.items()
+            ],
+        )
+        if result.rowcount != len(donation_ids):
+            raise StaleDataError(
+                f'{table.name}: {len(donation_ids) - result.rowcount} of '
+                f'{len(donation_ids)} intakes were allocated concurrently'
+            )
+
+
+donation_intake_crud = CRUDDonationIntake(DonationIntake)
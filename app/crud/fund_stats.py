@@ -0,0 +1,128 @@
+from typing import Dict, Iterable, Mapping, Sequence
+
+from sqlalchemy import distinct, exists, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.core.db import Base
+from app.models import CharityProject, Donation, FundStats
+
+STATS_ID = 1
+
+
+def stats_diff(
+    after: Mapping[str, int], before: Mapping[str, int]
+) -> Dict[str, int]:
+    """Per-counter difference of two fund statistics contributions."""
+    return {
+        key: after.get(key, 0) - before.get(key, 0)
+        for key in after.keys() | before.keys()
+    }
+
+
+class CRUDFundStats:
+    """
+    Single row of fund totals. Writers add their deltas in their own
+    transaction, so reading the statistics never scans the tables.
+    Every write also moves the generation by one.
+    """
+
+    async def get(self, session: AsyncSession) -> FundStats:
+        stats = await session.get(FundStats, STATS_ID)
+        if stats is None:
+            stats = FundStats(id=STATS_ID, **await self.calculate(session))
+        return stats
+
+    async def add(
+        self,
+        deltas: Mapping[str, int],
+        session: AsyncSession,
+        new_objs: Iterable[Base] = (),
+    ) -> None:
+        """
+        Add the deltas to the totals. Donors are counted from the new,
+        already flushed donations whose users had not donated before.
+        """
+        values = {
+            key: getattr(FundStats, key) + delta
+            for key, delta in deltas.items() if delta
+        }
+        donation_ids = [
+            obj.id for obj in new_objs if isinstance(obj, Donation)
+        ]
+        if donation_ids:
+            values['donors'] = FundStats.donors + self.new_donors(
+                donation_ids
+            )
+        if values:
+            await self.write(values, session)
+
+    async def bump(self, session: AsyncSession) -> None:
+        """
+        Move the generation for writes that leave the totals to a later
+        rebuild, like the bulk import.
+        """
+        await self.write({}, session)
+
+    async def rebuild(self, session: AsyncSession) -> None:
+        """Replace the totals with the ones computed from scratch."""
+        await self.write(await self.calculate(session), session)
+
+    async def write(self, values: Mapping, session: AsyncSession) -> None:
+        result = await session.execute(
+            update(FundStats).where(FundStats.id == STATS_ID).values(
+                **values, generation=FundStats.generation + 1
+            ).execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            # First write ever: build the row from the flushed data,
+            # which already includes this transaction's changes.
+            await session.flush()
+            session.add(FundStats(
+                id=STATS_ID, generation=1, **await self.calculate(session)
+            ))
+
+    async def get_generation(self, session: AsyncSession) -> int:
+        """Generation of the totals, a primary key lookup; 0 before any write."""
+        generation = await session.scalar(
+            select(FundStats.generation).where(FundStats.id == STATS_ID)
+        )
+        return generation or 0
+
+    @staticmethod
+    def new_donors(donation_ids: Sequence[int]):
+        new, prior = aliased(Donation), aliased(Donation)
+        return select(func.count(distinct(new.user_id))).where(
+            new.id.in_(donation_ids),
+            new.user_id.isnot(None),
+            ~exists().where(
+                prior.user_id == new.user_id,
+                prior.id < min(donation_ids),
+            ),
+        ).scalar_subquery()
+
+    async def calculate(self, session: AsyncSession) -> Dict[str, int]:
+        """Compute the totals from scratch."""
+        donations = (await session.execute(select(
+            func.coalesce(func.sum(Donation.full_amount), 0),
+            func.coalesce(func.sum(Donation.invested_amount), 0),
+            func.count(distinct(Donation.user_id)),
+        ))).one()
+        projects = (await session.execute(select(
+            func.count(CharityProject.id).filter(
+                CharityProject.fully_invested.is_(False)
+            ),
+            func.count(CharityProject.id).filter(
+                CharityProject.fully_invested.is_(True)
+            ),
+        ))).one()
+        return {
+            'raised_amount': donations[0],
+            'invested_amount': donations[1],
+            'donors': donations[2],
+            'open_projects': projects[0],
+            'closed_projects': projects[1],
+        }
+
+
+fund_stats_crud = CRUDFundStats()
@@ -1,14 +1,38 @@
 from fastapi import FastAPI
 
+from app.api.conditional import project_list_cache
 from app.api.routers import main_router
 from app.core.config import settings
-from app.core.init_db import create_first_superuser
+from app.core.db import engine, read_engine
+from app.core.metrics import MetricsMiddleware
+from app.core.init_db import (create_first_superuser,
+                              get_async_session_context)
+from app.core.password import password_hasher
+from app.core.sql_timing import SQLTimingMiddleware, instrument
+from app.services.allocation_engine import allocation_engine
+from app.services.intake import intake_worker
 
 app = FastAPI(title=settings.app_title)
 
 app.include_router(main_router)
+app.add_middleware(SQLTimingMiddleware)
+app.add_middleware(MetricsMiddleware)
+instrument(engine)
+instrument(read_engine)
 
 
 @app.on_event('startup')
 async def startup():
+    project_list_cache.clear()
     await create_first_superuser()
+    if settings.investment_mode == 'memory':
+        async with get_async_session_context() as session:
+            await allocation_engine.refresh(session)
+    if settings.donation_intake == 'async':
+        intake_worker.start()
+
+
+@app.on_event('shutdown')
+async def shutdown():
+    await intake_worker.stop()
+    password_hasher.shutdown()
@@ -1,3 +1,7 @@
 from .charity_project import CharityProject  # noqa
 from .donation import Donation  # noqa
+from .donation_allocation import DonationAllocation  # noqa
+from .donation_intake import DonationIntake  # noqa
+from .fund_stats import FundStats  # noqa
+from .import_checkpoint import ImportCheckpoint  # noqa
 from .user import User  # noqa
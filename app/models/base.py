@@ -1,6 +1,7 @@
 from datetime import datetime
 
-from sqlalchemy import Boolean, Column, DateTime, Integer
+from sqlalchemy import Boolean, Column, DateTime, Index, Integer, column
+from sqlalchemy.orm import declared_attr
 
 from app.core.db import Base
 
@@ -13,3 +14,26 @@ class CharityBase(Base):
     fully_invested = Column(Boolean, default=False)
     create_date = Column(DateTime, default=datetime.now)
     close_date = Column(DateTime, default=None)
+    # Seconds from creation to full funding, stamped on closing.
+    duration = Column(Integer)
+    version = Column(Integer, nullable=False)
+
+    @declared_attr
+    def __mapper_args__(cls):
+        # Every UPDATE checks and bumps the version, so concurrent
+        # allocations of the same row fail instead of overwriting each other.
+        return {'version_id_col': cls.version}
+
+    @declared_attr
+    def __table_args__(cls):
+        # Partial index matching the open objects FIFO scan.
+        is_open = column('fully_invested').is_(False)
+        return (
+            Index(
+                f'ix_{cls.__tablename__}_open_create_date',
+                'create_date',
+                'id',
+                sqlite_where=is_open,
+                postgresql_where=is_open,
+            ),
+        )
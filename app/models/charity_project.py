@@ -1,4 +1,6 @@
-from sqlalchemy import Column, String, Text
+from typing import Dict
+
+from sqlalchemy import Column, Index, String, Text, column
 
 from .base import CharityBase
 
@@ -8,7 +10,21 @@ class CharityProject(CharityBase):
     name = Column(String(100), unique=True, nullable=False)
     description = Column(Text, nullable=False)
 
+    def fund_stats(self) -> Dict[str, int]:
+        closed = int(bool(self.fully_invested))
+        return {'open_projects': 1 - closed, 'closed_projects': closed}
+
     def __repr__(self):
         return (
             f'{self.name}. Collected {self.invested_amount}/{self.full_amount}'
         )
+
+
+# Ranking of closed projects by how fast they were funded.
+Index(
+    'ix_charityproject_closed_duration',
+    CharityProject.duration,
+    CharityProject.id,
+    sqlite_where=column('fully_invested').is_(True),
+    postgresql_where=column('fully_invested').is_(True),
+)
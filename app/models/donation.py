@@ -1,4 +1,6 @@
-from sqlalchemy import Column, ForeignKey, Integer, Text
+from typing import Dict
+
+from sqlalchemy import Column, ForeignKey, Index, Integer, Text
 
 from .base import CharityBase
 
@@ -8,7 +10,16 @@ class Donation(CharityBase):
     user_id = Column(Integer, ForeignKey('user.id'))
     comment = Column(Text)
 
+    def fund_stats(self) -> Dict[str, int]:
+        return {
+            'raised_amount': self.full_amount,
+            'invested_amount': self.invested_amount or 0,
+        }
+
     def __repr__(self):
         return (
             f'№{self.id}. Invested: {self.invested_amount}/{self.full_amount}'
         )
+
+
+Index('ix_donation_user_id_id', Donation.user_id, Donation.id)
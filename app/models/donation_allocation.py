@@ -0,0 +1,36 @@
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer
+
+from app.core.db import Base
+
+
+class DonationAllocation(Base):
+    """Ledger entry: amount of a donation invested in a project."""
+    __tablename__ = 'donation_allocation'
+
+    donation_id = Column(Integer, ForeignKey('donation.id'), nullable=False)
+    project_id = Column(
+        Integer, ForeignKey('charityproject.id'), nullable=False
+    )
+    amount = Column(Integer, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+
+    def __repr__(self):
+        return (
+            f'Donation №{self.donation_id} -> project №{self.project_id}: '
+            f'{self.amount}'
+        )
+
+
+# Donations behind a project and projects funded by a donation.
+Index(
+    'ix_donation_allocation_project_id_donation_id',
+    DonationAllocation.project_id,
+    DonationAllocation.donation_id,
+)
+Index(
+    'ix_donation_allocation_donation_id_project_id',
+    DonationAllocation.donation_id,
+    DonationAllocation.project_id,
+)
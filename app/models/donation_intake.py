@@ -0,0 +1,31 @@
+from datetime import datetime
+
+from sqlalchemy import (Column, DateTime, ForeignKey, Index, Integer, Text,
+                        column)
+
+from app.core.db import Base
+
+
+class DonationIntake(Base):
+    """Donation accepted for later allocation by the intake worker."""
+    user_id = Column(Integer, ForeignKey('user.id'))
+    full_amount = Column(Integer, nullable=False)
+    comment = Column(Text)
+    create_date = Column(DateTime, default=datetime.now)
+    donation_id = Column(Integer, ForeignKey('donation.id'))
+
+    @property
+    def status(self) -> str:
+        return 'pending' if self.donation_id is None else 'allocated'
+
+    def __repr__(self):
+        return f'Intake №{self.id}: {self.full_amount}'
+
+
+# Queue of the intakes waiting for allocation.
+Index(
+    'ix_donationintake_pending',
+    DonationIntake.id,
+    sqlite_where=column('donation_id').is_(None),
+    postgresql_where=column('donation_id').is_(None),
+)
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer
+
+from app.core.db import Base
+
+
+class FundStats(Base):
+    """
+    Fund totals kept up to date by every write (single row).
+    `generation` grows with every write that opens or closes objects, so
+    other processes can tell their cached open objects are out of date.
+    """
+    raised_amount = Column(Integer, nullable=False, default=0)
+    invested_amount = Column(Integer, nullable=False, default=0)
+    open_projects = Column(Integer, nullable=False, default=0)
+    closed_projects = Column(Integer, nullable=False, default=0)
+    donors = Column(Integer, nullable=False, default=0)
+    generation = Column(Integer, nullable=False, default=0)
+
+    @property
+    def pending_amount(self) -> int:
+        """Donated money not invested in any project yet."""
+        return self.raised_amount - self.invested_amount
+
+    def __repr__(self):
+        return (
+            f'Raised {self.raised_amount}, invested {self.invested_amount}'
+        )
@@ -0,0 +1,17 @@
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, String
+
+from app.core.db import Base
+
+
+class ImportCheckpoint(Base):
+    """Records of a bulk import source committed so far."""
+    source = Column(String(1024), unique=True, nullable=False)
+    position = Column(Integer, nullable=False, default=0)
+    update_date = Column(
+        DateTime, default=datetime.now, onupdate=datetime.now
+    )
+
+    def __repr__(self):
+        return f'{self.source}: {self.position}'
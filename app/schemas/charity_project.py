@@ -31,3 +31,7 @@ class CharityProjectDB(CharityProjectCreate):
 
     class Config:
         orm_mode = True
+
+
+class CharityProjectDuration(CharityProjectDB):
+    duration: int
@@ -25,3 +25,13 @@ class DonationDB(DonationMyDB):
     invested_amount: int = 0
     fully_invested: bool = False
     close_date: datetime = None
+
+
+class DonationIntakeDB(DonationCreate):
+    id: int
+    create_date: datetime
+    status: str
+    donation_id: Optional[int]
+
+    class Config:
+        orm_mode = True
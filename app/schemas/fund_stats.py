@@ -0,0 +1,13 @@
+from pydantic import BaseModel
+
+
+class FundStatsDB(BaseModel):
+    raised_amount: int
+    invested_amount: int
+    pending_amount: int
+    open_projects: int
+    closed_projects: int
+    donors: int
+
+    class Config:
+        orm_mode = True
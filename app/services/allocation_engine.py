@@ -0,0 +1,176 @@
+import asyncio
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Type
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.exc import StaleDataError
+
+from app.core.db import Base
+from app.crud.fund_stats import fund_stats_crud
+from app.models import CharityProject, Donation
+
+
+class OpenItem:
+    """Open project/donation remaining in the allocation queue."""
+
+    __slots__ = (
+        'id', 'full_amount', 'invested_amount', 'fully_invested',
+        'create_date', 'close_date', 'duration', 'version',
+    )
+
+    def __init__(
+        self,
+        id: int,
+        full_amount: int,
+        invested_amount: Optional[int],
+        version: int,
+        create_date: datetime,
+    ) -> None:
+        self.id = id
+        self.full_amount = full_amount
+        self.invested_amount = invested_amount or 0
+        self.fully_invested = False
+        self.create_date = create_date
+        self.close_date = None
+        self.duration = None
+        self.version = version
+
+
+class AllocationEngine:
+    """
+    FIFO queues of open projects and donations kept in process memory.
+    Built from the database once and updated incrementally afterwards, so
+    allocation only visits the rows it actually consumes.
+    Writes of other processes (other workers, the importer, the
+    reconciliation) are caught by comparing the fund statistics generation
+    with the one the queues were built at.
+    """
+
+    def __init__(self) -> None:
+        self.queues: Dict[Type[Base], 'OrderedDict[int, OpenItem]'] = {
+            CharityProject: OrderedDict(),
+            Donation: OrderedDict(),
+        }
+        self.lock = asyncio.Lock()
+        self.loaded = False
+        self.generation = 0
+
+    async def refresh(self, session: AsyncSession) -> None:
+        """
+        Reload the queues if they are not loaded or the generation moved
+        since their last update, i.e. some other process wrote in between.
+        """
+        generation = await fund_stats_crud.get_generation(session)
+        if not self.loaded or generation != self.generation:
+            await self.load(session)
+        self.generation = generation
+
+    async def load(self, session: AsyncSession) -> None:
+        """Fill the queues with open objects in creation order."""
+        for model, queue in self.queues.items():
+            queue.clear()
+            rows = await session.execute(
+                select(
+                    model.id,
+                    model.full_amount,
+                    model.invested_amount,
+                    model.version,
+                    model.create_date,
+                ).where(
+                    model.fully_invested.is_(False)
+                ).order_by(model.create_date, model.id)
+            )
+            for row in rows:
+                queue[row.id] = OpenItem(*row)
+        self.loaded = True
+
+    def open_items(self, model: Type[Base]) -> Iterator[OpenItem]:
+        return iter(self.queues[model].values())
+
+    async def write_back(
+        self,
+        model: Type[Base],
+        items: List[OpenItem],
+        session: AsyncSession,
+    ) -> None:
+        """
+        Update only the rows touched by the allocation.
+        Raises StaleDataError if any of them was changed concurrently.
+        """
+        if not items:
+            return
+        table = model.__table__
+        result = await session.execute(
+            update(table).where(
+                table.c.id == bindparam('item_id'),
+                table.c.version == bindparam('item_version'),
+            ).values(
+                invested_amount=bindparam('invested_amount'),
+                fully_invested=bindparam('fully_invested'),
+                close_date=bindparam('close_date'),
+                duration=bindparam('duration'),
+                version=bindparam('item_version') + 1,
+            ),
+            [
+                {
+                    'item_id': item.id,
+                    'item_version': item.version,
+                    'invested_amount': item.invested_amount,
+                    'fully_invested': item.fully_invested,
+                    'close_date': item.close_date,
+                    'duration': item.duration,
+                }
+                for item in items
+            ],
+        )
+        if result.rowcount != len(items):
+            raise StaleDataError(
+                f'{table.name}: {len(items) - result.rowcount} of '
+                f'{len(items)} rows were changed concurrently'
+            )
+        for item in items:
+            item.version += 1
+
+    def apply(self, model: Type[Base], items: Iterable[OpenItem]) -> None:
+        """
+        Drop the items closed by a committed allocation. The allocation has
+        moved the generation by one.
+        """
+        if not self.loaded:
+            return
+        self.generation += 1
+        queue = self.queues[model]
+        for item in items:
+            if item.fully_invested:
+                queue.pop(item.id, None)
+
+    def push(self, obj: Base) -> None:
+        """Queue a new object if it still has funds to collect/invest."""
+        if self.loaded and not obj.fully_invested:
+            self.queues[type(obj)][obj.id] = OpenItem(
+                obj.id, obj.full_amount, obj.invested_amount, obj.version,
+                obj.create_date,
+            )
+
+    def sync(self, obj: Base) -> None:
+        """Reflect an edited object in its queue."""
+        if not self.loaded:
+            return
+        item = self.queues[type(obj)].get(obj.id)
+        if item is None:
+            return
+        if obj.fully_invested:
+            self.discard(obj)
+        else:
+            item.full_amount = obj.full_amount
+            item.version = obj.version
+
+    def discard(self, obj: Base) -> None:
+        """Remove a deleted/closed object from its queue."""
+        if self.loaded:
+            self.queues[type(obj)].pop(obj.id, None)
+
+
+allocation_engine = AllocationEngine()
@@ -0,0 +1,226 @@
+"""
+Bulk import of historical users, projects and donations.
+
+Records are streamed from CSV or JSONL files and inserted with executemany
+in chunks, one transaction per chunk. Nothing is allocated on the way: the
+imported projects and donations are open and empty, and a single
+reconciliation pass at the end distributes them in creation order.
+
+The number of committed records of every file is kept in the
+importcheckpoint table, in the same transaction as the chunk, so an
+interrupted import resumes right after the last committed chunk.
+"""
+import asyncio
+import csv
+import json
+import time
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+from typing import (Awaitable, Callable, Dict, Iterator, List, Optional,
+                    Tuple, Type)
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.core.db import Base
+from app.core.password import hash_password, password_hasher
+from app.crud.fund_stats import fund_stats_crud
+from app.models import CharityProject, Donation, ImportCheckpoint, User
+from app.schemas.charity_project import CharityProjectCreate
+from app.schemas.donation import DonationCreate
+from app.services.reconciliation import ReconcileReport, reconcile
+
+ProgressType = Callable[[str, int, float], None]
+
+
+class RecordError(ValueError):
+    """Chunk of an import file that could not be inserted."""
+
+    def __init__(
+        self, path: Path, first: int, last: int, error: Exception
+    ) -> None:
+        super().__init__(f'{path}, records {first}-{last}: {error}')
+
+
+def read_records(path: Path) -> Iterator[dict]:
+    """Records of a .csv (with a header row) or .jsonl file, lazily."""
+    with open(path, newline='', encoding='utf-8') as file:
+        if path.suffix == '.csv':
+            yield from csv.DictReader(file)
+        else:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def parse_bool(value, default: bool) -> bool:
+    if value in (None, ''):
+        return default
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes')
+    return bool(value)
+
+
+def investment_row(record: dict) -> dict:
+    """Columns of a new open project/donation created at its old date."""
+    create_date = record.get('create_date')
+    return {
+        'invested_amount': 0,
+        'fully_invested': False,
+        'create_date': (
+            datetime.fromisoformat(create_date) if create_date
+            else datetime.now()
+        ),
+        'close_date': None,
+        'duration': None,
+        'version': 1,
+    }
+
+
+async def project_rows(
+    records: List[dict], session: AsyncSession
+) -> List[dict]:
+    return [
+        {
+            **CharityProjectCreate(
+                name=record.get('name'),
+                description=record.get('description'),
+                full_amount=record.get('full_amount'),
+            ).dict(),
+            **investment_row(record),
+        }
+        for record in records
+    ]
+
+
+async def donation_rows(
+    records: List[dict], session: AsyncSession
+) -> List[dict]:
+    """Donors are referenced by `user_id` or by `user_email`."""
+    emails = {record['user_email'] for record in records
+              if record.get('user_email')}
+    user_ids = {}
+    if emails:
+        user_ids = dict((await session.execute(
+            select(User.email, User.id).where(User.email.in_(emails))
+        )).all())
+        unknown = emails - user_ids.keys()
+        if unknown:
+            raise ValueError(f'unknown users: {", ".join(sorted(unknown))}')
+    rows = []
+    for record in records:
+        user_id = record.get('user_id') or None
+        if record.get('user_email'):
+            user_id = user_ids[record['user_email']]
+        rows.append({
+            **DonationCreate(
+                full_amount=record.get('full_amount'),
+                comment=record.get('comment') or None,
+            ).dict(),
+            'user_id': None if user_id is None else int(user_id),
+            **investment_row(record),
+        })
+    return rows
+
+
+async def user_rows(
+    records: List[dict], session: AsyncSession
+) -> List[dict]:
+    """Passwords come hashed (`hashed_password`) or plain (`password`)."""
+    for record in records:
+        if not record.get('email'):
+            raise ValueError('email is required')
+        if not (record.get('hashed_password') or record.get('password')):
+            raise ValueError(f'{record["email"]}: password is required')
+    hashed = await asyncio.gather(*(
+        password_hasher.run(hash_password, record['password'])
+        for record in records if not record.get('hashed_password')
+    ))
+    hashed = iter(hashed)
+    return [
+        {
+            'email': record['email'],
+            'hashed_password': (
+                record.get('hashed_password') or next(hashed)
+            ),
+            'is_active': parse_bool(record.get('is_active'), True),
+            'is_superuser': parse_bool(record.get('is_superuser'), False),
+            'is_verified': parse_bool(record.get('is_verified'), False),
+        }
+        for record in records
+    ]
+
+
+ConvertType = Callable[[List[dict], AsyncSession], Awaitable[List[dict]]]
+SOURCES: Dict[str, Tuple[Type[Base], ConvertType]] = {
+    'users': (User, user_rows),
+    'projects': (CharityProject, project_rows),
+    'donations': (Donation, donation_rows),
+}
+
+
+async def get_checkpoint(
+    source: str, session: AsyncSession
+) -> ImportCheckpoint:
+    checkpoint = (await session.execute(
+        select(ImportCheckpoint).where(ImportCheckpoint.source == source)
+    )).scalars().first()
+    if checkpoint is None:
+        checkpoint = ImportCheckpoint(source=source, position=0)
+        session.add(checkpoint)
+    return checkpoint
+
+
+async def import_file(
+    session_factory: sessionmaker,
+    kind: str,
+    path: Path,
+    chunk_size: int = 10000,
+    progress: Optional[ProgressType] = None,
+) -> int:
+    """
+    Import the records of one file, skipping the ones committed by an
+    earlier run. Returns the number of committed records of the file.
+    """
+    model, convert = SOURCES[kind]
+    source = f'{kind}:{path.resolve()}'
+    started = time.perf_counter()
+    async with session_factory() as session:
+        checkpoint = await get_checkpoint(source, session)
+        position = resumed = checkpoint.position
+        records = islice(read_records(path), position, None)
+        while True:
+            chunk = list(islice(records, chunk_size))
+            if not chunk:
+                break
+            try:
+                rows = await convert(chunk, session)
+                await session.execute(insert(model.__table__), rows)
+            except (KeyError, TypeError, ValueError, IntegrityError) as error:
+                raise RecordError(
+                    path, position + 1, position + len(chunk), error
+                ) from error
+            # New open objects: the in-memory queues of running workers
+            # must be rebuilt.
+            await fund_stats_crud.bump(session)
+            position += len(chunk)
+            checkpoint.position = position
+            await session.commit()
+            if progress is not None:
+                progress(source, position, (position - resumed) / max(
+                    time.perf_counter() - started, 1e-9
+                ))
+    return position
+
+
+async def allocate_all(
+    session_factory: sessionmaker, chunk_size: int = 10000
+) -> ReconcileReport:
+    """Single allocation pass over everything imported."""
+    async with session_factory() as session:
+        report = await reconcile(session, chunk_size)
+        await session.commit()
+    return report
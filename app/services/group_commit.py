@@ -0,0 +1,115 @@
+import asyncio
+from typing import (Awaitable, Callable, Dict, List, Optional, Sequence,
+                    TypeVar)
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.db import Base
+from app.crud.base import CRUDBase
+
+ModelType = TypeVar('ModelType', bound=Base)
+CommitType = Callable[
+    [Sequence[ModelType], CRUDBase, AsyncSession], Awaitable[Sequence]
+]
+
+
+def resolve(
+    future: asyncio.Future,
+    result: Optional[Base] = None,
+    error: Optional[Exception] = None,
+) -> None:
+    """Resolve a waiter's future unless the waiter was cancelled."""
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+class Batch:
+    """Allocations collected for one transaction, in arrival order."""
+
+    def __init__(self) -> None:
+        self.sources: List[Base] = []
+        self.futures: List[asyncio.Future] = []
+        self.full = asyncio.Event()
+
+
+class GroupCommitCoordinator:
+    """
+    Group commit of concurrent allocations. The first request of a batch
+    waits for the window (or for the batch to fill up) and allocates all
+    collected sources in its own session and one transaction; the other
+    requests wait for their own object. Donations and projects are batched
+    separately, since they are allocated in opposite directions.
+    """
+
+    def __init__(self, commit: CommitType) -> None:
+        self.commit = commit
+        self.batches: Dict[CRUDBase, Batch] = {}
+
+    async def submit(
+        self, source: ModelType, invest_in: CRUDBase, session: AsyncSession
+    ) -> ModelType:
+        """Allocate the new, not flushed source with the current batch."""
+        if source in session:
+            session.expunge(source)
+        future = asyncio.get_running_loop().create_future()
+        batch = self.batches.get(invest_in)
+        if batch is not None:
+            batch.sources.append(source)
+            batch.futures.append(future)
+            if len(batch.sources) >= settings.group_commit_size:
+                del self.batches[invest_in]
+                batch.full.set()
+            return await future
+        batch = self.batches[invest_in] = Batch()
+        batch.sources.append(source)
+        batch.futures.append(future)
+        try:
+            try:
+                await asyncio.wait_for(
+                    batch.full.wait(), settings.group_commit_window
+                )
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                # Even a cancelled leader must not leave its batch open.
+                if self.batches.get(invest_in) is batch:
+                    del self.batches[invest_in]
+            await self.commit_batch(batch, invest_in, session)
+        finally:
+            for pending in batch.futures:
+                if pending is not future:
+                    resolve(pending, error=RuntimeError(
+                        'Group commit was interrupted'
+                    ))
+        return await future
+
+    async def commit_batch(
+        self, batch: Batch, invest_in: CRUDBase, session: AsyncSession
+    ) -> None:
+        try:
+            await self.commit(batch.sources, invest_in, session)
+        except Exception as error:
+            if len(batch.sources) == 1:
+                resolve(batch.futures[0], error=error)
+                return
+            # One bad source must not fail the others: retry one by one.
+            await session.rollback()
+            for source, future in zip(batch.sources, batch.futures):
+                source.id = None
+                try:
+                    await self.commit((source,), invest_in, session)
+                except Exception as error:
+                    await session.rollback()
+                    resolve(future, error=error)
+                else:
+                    # Keep it loaded through the rollbacks of the others.
+                    session.expunge(source)
+                    resolve(future, source)
+            return
+        for source, future in zip(batch.sources, batch.futures):
+            resolve(future, source)
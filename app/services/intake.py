@@ -0,0 +1,97 @@
+import asyncio
+import logging
+from typing import Optional
+
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal
+from app.crud.charity_project import charity_project_crud
+from app.crud.donation_intake import donation_intake_crud
+from app.models import Donation
+from app.services.investment import batch_investment
+
+logger = logging.getLogger(__name__)
+
+
+class IntakeWorker:
+    """
+    Background task turning accepted intakes into donations. Every batch of
+    pending intakes is allocated in one transaction, so a burst of requests
+    costs one write transaction per batch instead of one per donation.
+    """
+
+    def __init__(self, session_factory: sessionmaker) -> None:
+        self.session_factory = session_factory
+        self.wakeup = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self.wakeup = asyncio.Event()
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self.task is None:
+            return
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.task = None
+
+    def notify(self) -> None:
+        """Wake the worker up after a new intake was committed."""
+        self.wakeup.set()
+
+    async def run(self) -> None:
+        while True:
+            self.wakeup.clear()
+            try:
+                allocated = await self.drain()
+            except Exception:
+                logger.exception('Donation intake allocation failed')
+                allocated = 0
+            if allocated < settings.intake_batch_size:
+                # Intakes of other processes are picked up by the timeout.
+                try:
+                    await asyncio.wait_for(
+                        self.wakeup.wait(), settings.intake_interval
+                    )
+                except asyncio.TimeoutError:
+                    pass
+
+    async def drain(self) -> int:
+        """Allocate one batch of pending intakes, return its size."""
+        async with self.session_factory() as session:
+            intakes = await donation_intake_crud.get_pending(
+                settings.intake_batch_size, session
+            )
+            if not intakes:
+                return 0
+            intake_ids = [intake.id for intake in intakes]
+            donations = [
+                Donation(
+                    user_id=intake.user_id,
+                    full_amount=intake.full_amount,
+                    comment=intake.comment,
+                )
+                for intake in intakes
+            ]
+
+            async def link_donations() -> None:
+                await donation_intake_crud.link_donations(
+                    {
+                        intake_id: donation.id
+                        for intake_id, donation in zip(intake_ids, donations)
+                    },
+                    session,
+                )
+
+            await batch_investment(
+                donations, charity_project_crud, session, link_donations
+            )
+            return len(donations)
+
+
+intake_worker = IntakeWorker(AsyncSessionLocal)
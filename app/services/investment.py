@@ -1,10 +1,22 @@
+from collections import Counter
 from datetime import datetime
-from typing import TypeVar
+from typing import (Awaitable, Callable, Dict, Iterable, Iterator, List,
+                    Optional, Sequence, Tuple, Type, TypeVar)
 
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.exc import StaleDataError
 
+from app.core.cache import data_version
+from app.core.config import settings
+from app.core.metrics import allocation_rows, projects_closed
 from app.core.db import Base
 from app.crud.base import CRUDBase
+from app.crud.donation_allocation import donation_allocation_crud
+from app.crud.fund_stats import fund_stats_crud
+from app.models import Donation
+from app.services.allocation_engine import OpenItem, allocation_engine
+from app.services.group_commit import GroupCommitCoordinator
 
 ModelType = TypeVar('ModelType', bound=Base)
 CRUDType = TypeVar('CRUDType', bound=CRUDBase)
@@ -14,6 +26,203 @@ def close_investment(obj: ModelType) -> None:
     """Setting attributes for a closed project/donation."""
     obj.fully_invested = True
     obj.close_date = datetime.now()
+    obj.duration = int((obj.close_date - obj.create_date).total_seconds())
+
+
+def open_investment(obj: ModelType) -> None:
+    """Setting attributes for a new project/donation."""
+    obj.create_date = datetime.now()
+    obj.invested_amount = 0
+    obj.fully_invested = False
+    obj.close_date = None
+    obj.duration = None
+
+
+def distribute(
+    sources: Iterable[ModelType],
+    targets: Iterable,
+    transfers: Optional[List] = None,
+) -> List:
+    """
+    Two-pointer merge of FIFO ordered sources into FIFO ordered targets.
+    Returns the targets that were touched; every (source, target, amount)
+    moved is appended to `transfers`.
+    """
+    touched = []
+    targets = iter(targets)
+    target = next(targets, None)
+    for source in sources:
+        while target is not None:
+            for_invest = source.full_amount - source.invested_amount
+            investitions = target.full_amount - target.invested_amount
+            to_invest = min(for_invest, investitions)
+            target.invested_amount += to_invest
+            source.invested_amount += to_invest
+            if transfers is not None:
+                transfers.append((source, target, to_invest))
+            if not touched or touched[-1] is not target:
+                touched.append(target)
+            if target.full_amount == target.invested_amount:
+                close_investment(target)
+                target = next(targets, None)
+            if source.full_amount == source.invested_amount:
+                close_investment(source)
+                break
+    return touched
+
+
+def allocation_stats(
+    sources: Sequence[ModelType], touched: Iterable
+) -> Dict[str, int]:
+    """Fund statistics deltas of the new sources and the touched targets."""
+    deltas = Counter()
+    for source in sources:
+        deltas.update(source.fund_stats())
+    if isinstance(sources[0], Donation):
+        closed = sum(1 for target in touched if target.fully_invested)
+        deltas.update(open_projects=-closed, closed_projects=closed)
+    else:
+        deltas.update(invested_amount=sum(
+            source.invested_amount for source in sources
+        ))
+    return deltas
+
+
+def ledger_entries(transfers: Iterable) -> Iterator[Tuple[int, int, int]]:
+    """(donation_id, project_id, amount) of the flushed transfers."""
+    for source, target, amount in transfers:
+        if isinstance(source, Donation):
+            yield source.id, target.id, amount
+        else:
+            yield target.id, source.id, amount
+
+
+async def reload(
+    model: Type[ModelType], ids: List[int], session: AsyncSession
+) -> None:
+    """Reload the objects from the database with a single query."""
+    await session.execute(
+        select(model).where(model.id.in_(ids)).execution_options(
+            populate_existing=True
+        )
+    )
+
+
+async def open_objects(
+    sources: Sequence[ModelType], invest_in: CRUDType, session: AsyncSession
+) -> Iterable:
+    """Open objects to invest in, in FIFO order."""
+    if settings.investment_mode == 'sql':
+        amount = sum(
+            source.full_amount - source.invested_amount for source in sources
+        )
+        return [
+            OpenItem(*row)
+            for row in await invest_in.get_open_for_amount(amount, session)
+        ]
+    if settings.investment_mode == 'memory':
+        await allocation_engine.refresh(session)
+        return allocation_engine.open_items(invest_in.model)
+    return await invest_in.get_multi_open(session)
+
+
+async def allocate(
+    sources: Sequence[ModelType], invest_in: CRUDType, session: AsyncSession
+) -> List:
+    """
+    Distribute the new, not yet flushed sources and flush them together
+    with the touched objects, so the INSERT already carries the invested
+    amounts. The fund statistics and the allocation ledger are written in
+    the same transaction. If a concurrent allocation has changed the same
+    rows, the version check fails, the transaction is rolled back and the
+    allocation is retried on fresh data.
+    """
+    for attempt in range(1, settings.investment_retries + 1):
+        for source in sources:
+            open_investment(source)
+        transfers = []
+        with session.no_autoflush:
+            objects = await open_objects(sources, invest_in, session)
+            touched = distribute(sources, objects, transfers)
+        try:
+            if settings.investment_mode == 'memory':
+                await allocation_engine.write_back(
+                    invest_in.model, touched, session
+                )
+            elif settings.investment_mode == 'sql':
+                await invest_in.save_invested(touched, session)
+            session.add_all(sources)
+            await session.flush()
+            await fund_stats_crud.add(
+                allocation_stats(sources, touched), session, new_objs=sources
+            )
+            await donation_allocation_crud.record(
+                ledger_entries(transfers), session
+            )
+            return touched
+        except StaleDataError:
+            await session.rollback()
+            allocation_engine.loaded = False
+            if attempt == settings.investment_retries:
+                raise
+            for source in sources:
+                source.id = None
+
+
+async def commit_investment(
+    sources: Sequence[ModelType],
+    invest_in: CRUDType,
+    session: AsyncSession,
+    before_commit: Optional[Callable[[], Awaitable[None]]] = None,
+) -> None:
+    """
+    Allocate and commit the sources in one transaction.
+    `before_commit` adds the caller's own writes to the same transaction,
+    once the sources have their ids.
+    """
+    try:
+        touched = await allocate(sources, invest_in, session)
+        source_ids = [source.id for source in sources]
+        if before_commit is not None:
+            await before_commit()
+        closed = allocation_stats(sources, touched)['closed_projects']
+        await session.commit()
+    except Exception:
+        allocation_engine.loaded = False
+        raise
+    data_version.bump()
+    allocation_rows.observe(len(touched))
+    projects_closed.inc(amount=closed)
+    allocation_engine.apply(invest_in.model, touched)
+    if session.sync_session.expire_on_commit:
+        await reload(type(sources[0]), source_ids, session)
+    for source in sources:
+        allocation_engine.push(source)
+
+
+async def batch_investment(
+    sources: Sequence[ModelType],
+    invest_in: CRUDType,
+    session: AsyncSession,
+    before_commit: Optional[Callable[[], Awaitable[None]]] = None,
+) -> Sequence[ModelType]:
+    """
+    Distributing several new projects/donations in one pass and one
+    transaction. The sources must not be flushed yet.
+    """
+    if not sources:
+        await session.commit()
+    elif settings.investment_mode == 'memory':
+        async with allocation_engine.lock:
+            await commit_investment(
+                sources, invest_in, session, before_commit
+            )
+    else:
+        await commit_investment(sources, invest_in, session, before_commit)
+    return sources
+
+
+allocation_coordinator = GroupCommitCoordinator(batch_investment)
 
 
 async def investment(
@@ -21,20 +230,12 @@ async def investment(
 ) -> ModelType:
     """
     Distributing donations process when creating a new project/donation.
+    With group commit on, concurrent requests share one transaction and the
+    returned object may belong to another request's session.
     """
-    objects = await invest_in.get_multi_open(session)
-    for object in objects:
-        for_invest = invest_from.full_amount - invest_from.invested_amount
-        investitions = object.full_amount - object.invested_amount
-        to_invest = min(for_invest, investitions)
-        object.invested_amount += to_invest
-        invest_from.invested_amount += to_invest
-        if object.full_amount == object.invested_amount:
-            close_investment(object)
-        if invest_from.full_amount == invest_from.invested_amount:
-            close_investment(invest_from)
-            break
-    session.add_all((*objects, invest_from))
-    await session.commit()
-    await session.refresh(invest_from)
+    if settings.group_commit:
+        return await allocation_coordinator.submit(
+            invest_from, invest_in, session
+        )
+    await batch_investment((invest_from,), invest_in, session)
     return invest_from
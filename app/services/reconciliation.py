@@ -0,0 +1,249 @@
+"""
+Rebuild of the invested amounts from scratch.
+
+Donations and projects are replayed in creation order: the allocation is
+FIFO on both sides, so the final state is a two-pointer merge of both
+streams. Each table is read through a server-side cursor chunk by chunk
+and the corrections are written back in batches, so memory is bounded by
+the chunk size, not by the table sizes. The merge also yields every
+(donation, project, amount) transfer, so the allocation ledger is rebuilt
+from the same replay.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import (AsyncIterator, Callable, Dict, List, Optional, Tuple,
+                    Type)
+
+from sqlalchemy import bindparam, delete, insert, select, update
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.db import Base
+from app.crud.fund_stats import fund_stats_crud
+from app.models import CharityProject, Donation, DonationAllocation
+
+RECONCILED_FIELDS = (
+    'invested_amount', 'fully_invested', 'close_date', 'duration'
+)
+
+
+@dataclass
+class Drift:
+    """Stored values of an object that differ from the replay."""
+    model: Type[Base]
+    id: int
+    changes: Dict[str, Tuple] = field(default_factory=dict)
+
+    def as_dict(self) -> dict:
+        return {
+            'table': self.model.__tablename__,
+            'id': self.id,
+            **{
+                name: [
+                    value.isoformat() if isinstance(value, datetime)
+                    else value
+                    for value in change
+                ]
+                for name, change in self.changes.items()
+            },
+        }
+
+
+@dataclass
+class ReconcileReport:
+    checked: Dict[str, int] = field(default_factory=dict)
+    drifted: Dict[str, int] = field(default_factory=dict)
+
+
+async def next_row(rows: AsyncIterator[Row]) -> Optional[Row]:
+    try:
+        return await rows.__anext__()
+    except StopAsyncIteration:
+        return None
+
+
+async def stream_rows(
+    model: Type[Base], session: AsyncSession, chunk_size: int
+) -> AsyncIterator[Row]:
+    """Objects in creation order, fetched `chunk_size` rows at a time."""
+    result = await session.stream(
+        select(
+            model.id,
+            model.full_amount,
+            model.invested_amount,
+            model.fully_invested,
+            model.create_date,
+            model.close_date,
+            model.duration,
+        ).order_by(model.create_date, model.id).execution_options(
+            max_row_buffer=chunk_size
+        )
+    )
+    async for rows in result.partitions(chunk_size):
+        for row in rows:
+            yield row
+
+
+class Reconciler:
+    """
+    Compares the replayed state with the stored rows and, unless it is a
+    dry run, writes the corrections back in batches of `chunk_size`.
+    Close dates of objects that stay closed are kept: the allocation
+    stamps the real time, the replay only knows the creation dates.
+    The ledger is replaced by the replayed transfers, stamped with the
+    replayed close time as well.
+    """
+
+    def __init__(
+        self,
+        session: AsyncSession,
+        chunk_size: int,
+        dry_run: bool = False,
+        on_drift: Optional[Callable[[Drift], None]] = None,
+    ) -> None:
+        self.session = session
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+        self.on_drift = on_drift
+        self.report = ReconcileReport()
+        self.pending: Dict[Type[Base], List[dict]] = {
+            Donation: [], CharityProject: []
+        }
+        self.ledger: List[dict] = []
+
+    async def run(self) -> ReconcileReport:
+        donations = stream_rows(Donation, self.session, self.chunk_size)
+        projects = stream_rows(CharityProject, self.session, self.chunk_size)
+        donation = await next_row(donations)
+        project = await next_row(projects)
+        donated = invested = 0
+        if not self.dry_run:
+            await self.session.execute(delete(DonationAllocation))
+        while donation is not None and project is not None:
+            amount = min(
+                donation.full_amount - donated,
+                project.full_amount - invested,
+            )
+            donated += amount
+            invested += amount
+            closed_at = max(donation.create_date, project.create_date)
+            if amount:
+                await self.transfer(donation.id, project.id, amount, closed_at)
+            if donated == donation.full_amount:
+                await self.check(Donation, donation, donated, closed_at)
+                donation = await next_row(donations)
+                donated = 0
+            if invested == project.full_amount:
+                await self.check(CharityProject, project, invested, closed_at)
+                project = await next_row(projects)
+                invested = 0
+        # Whatever is left on one side stays open.
+        for model, row, amount, rows in (
+            (Donation, donation, donated, donations),
+            (CharityProject, project, invested, projects),
+        ):
+            while row is not None:
+                await self.check(model, row, amount, None)
+                row = await next_row(rows)
+                amount = 0
+        for model in self.pending:
+            await self.write_back(model)
+        await self.write_ledger()
+        if not self.dry_run:
+            await fund_stats_crud.rebuild(self.session)
+        return self.report
+
+    async def check(
+        self,
+        model: Type[Base],
+        row: Row,
+        invested_amount: int,
+        closed_at: Optional[datetime],
+    ) -> None:
+        table = model.__tablename__
+        self.report.checked[table] = self.report.checked.get(table, 0) + 1
+        close_date = closed_at
+        if (closed_at is not None and row.fully_invested and
+                row.close_date is not None):
+            close_date = row.close_date
+        expected = {
+            'invested_amount': invested_amount,
+            'fully_invested': closed_at is not None,
+            'close_date': close_date,
+            'duration': None if close_date is None else int(
+                (close_date - row.create_date).total_seconds()
+            ),
+        }
+        drift = Drift(model, row.id, {
+            name: (getattr(row, name), value)
+            for name, value in expected.items()
+            if getattr(row, name) != value
+        })
+        if not drift.changes:
+            return
+        self.report.drifted[table] = self.report.drifted.get(table, 0) + 1
+        if self.on_drift is not None:
+            self.on_drift(drift)
+        if self.dry_run:
+            return
+        self.pending[model].append({'row_id': row.id, **expected})
+        if len(self.pending[model]) >= self.chunk_size:
+            await self.write_back(model)
+
+    async def transfer(
+        self,
+        donation_id: int,
+        project_id: int,
+        amount: int,
+        created_at: datetime,
+    ) -> None:
+        table = DonationAllocation.__tablename__
+        self.report.checked[table] = self.report.checked.get(table, 0) + 1
+        if self.dry_run:
+            return
+        self.ledger.append({
+            'donation_id': donation_id,
+            'project_id': project_id,
+            'amount': amount,
+            'created_at': created_at,
+        })
+        if len(self.ledger) >= self.chunk_size:
+            await self.write_ledger()
+
+    async def write_ledger(self) -> None:
+        if not self.ledger:
+            return
+        await self.session.execute(
+            insert(DonationAllocation.__table__), self.ledger
+        )
+        self.ledger = []
+
+    async def write_back(self, model: Type[Base]) -> None:
+        rows = self.pending[model]
+        if not rows:
+            return
+        table = model.__table__
+        # The version bump makes in-flight allocations of the old values
+        # fail their version check and retry on the repaired rows.
+        await self.session.execute(
+            update(table).where(table.c.id == bindparam('row_id')).values(
+                **{name: bindparam(name) for name in RECONCILED_FIELDS},
+                version=table.c.version + 1,
+            ),
+            rows,
+        )
+        self.pending[model] = []
+
+
+async def reconcile(
+    session: AsyncSession,
+    chunk_size: int = 10000,
+    dry_run: bool = False,
+    on_drift: Optional[Callable[[Drift], None]] = None,
+) -> ReconcileReport:
+    """
+    Replay all donations and projects and repair the drifted rows, the
+    allocation ledger and the fund statistics in the session's
+    transaction; the caller commits.
+    """
+    return await Reconciler(session, chunk_size, dry_run, on_drift).run()
@@ -0,0 +1,188 @@
+"""
+Allocation latency at realistic backlog sizes.
+
+Seeds a temporary SQLite database with open projects (or open donations)
+and times every allocation entry point against it, in process:
+
+    python -m benchmarks.allocation --sizes 1000 10000 100000
+    INVESTMENT_MODE=sql python -m benchmarks.allocation > sql.jsonl
+
+Prints one JSON line per scenario and backlog size with p50/p95 latency,
+SQL statements per operation and the peak RSS of the process so far.
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, List
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, insert
+
+TMP_DIR = tempfile.TemporaryDirectory()
+DATABASE_PATH = Path(TMP_DIR.name) / 'bench.db'
+os.environ['DATABASE_URL'] = f'sqlite+aiosqlite:///{DATABASE_PATH}'
+
+from app.core.base import Base  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.core.db import AsyncSessionLocal, engine  # noqa: E402
+from app.core.user import current_superuser, current_user  # noqa: E402
+from app.crud.charity_project import charity_project_crud  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import CharityProject, Donation, User  # noqa: E402
+from app.services.allocation_engine import allocation_engine  # noqa: E402
+from app.services.investment import investment  # noqa: E402
+
+CHUNK_SIZE = 10000
+PROJECT_AMOUNT = 1000
+DONATION_AMOUNT = 100
+bench_user = User(
+    id=1, email='bench@example.com', hashed_password='', is_active=True,
+    is_verified=True, is_superuser=True,
+)
+
+
+def seed(size: int, open_model, closed_model) -> None:
+    """Recreate the tables with `size` open and `size` closed objects."""
+    sync_engine = create_engine(f'sqlite:///{DATABASE_PATH}')
+    Base.metadata.drop_all(sync_engine)
+    Base.metadata.create_all(sync_engine)
+    start = datetime(2020, 1, 1)
+    with sync_engine.begin() as conn:
+        conn.execute(insert(User.__table__), [{
+            'id': bench_user.id, 'email': bench_user.email,
+            'hashed_password': '', 'is_active': True,
+            'is_verified': True, 'is_superuser': True,
+        }])
+        for model, is_open in ((open_model, True), (closed_model, False)):
+            full_amount = (
+                PROJECT_AMOUNT if model is CharityProject else DONATION_AMOUNT
+            )
+            rows = []
+            for number in range(size):
+                create_date = start + timedelta(seconds=number)
+                row = {
+                    'full_amount': full_amount,
+                    'invested_amount': full_amount // 2 if is_open
+                    else full_amount,
+                    'fully_invested': not is_open,
+                    'create_date': create_date,
+                    'close_date': None if is_open else create_date,
+                    'duration': None if is_open else 0,
+                    'version': 1,
+                }
+                if model is CharityProject:
+                    row.update(name=f'project {number}', description='bench')
+                else:
+                    row['user_id'] = bench_user.id
+                rows.append(row)
+                if len(rows) == CHUNK_SIZE:
+                    conn.execute(insert(model.__table__), rows)
+                    rows = []
+            if rows:
+                conn.execute(insert(model.__table__), rows)
+    sync_engine.dispose()
+    allocation_engine.loaded = False
+
+
+def measure(operation: Callable[[int], None], requests: int,
+            warmup: int) -> dict:
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements[-1] += 1
+
+    for number in range(warmup):
+        operation(-1 - number)
+    latencies = []
+    event.listen(engine.sync_engine, 'before_cursor_execute', count)
+    try:
+        for number in range(requests):
+            statements.append(0)
+            started = time.perf_counter()
+            operation(number)
+            latencies.append(time.perf_counter() - started)
+    finally:
+        event.remove(engine.sync_engine, 'before_cursor_execute', count)
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        'p50_ms': round(quantiles[49] * 1000, 2),
+        'p95_ms': round(quantiles[94] * 1000, 2),
+        'statements': round(statistics.mean(statements), 2),
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def scenarios(client: TestClient) -> dict:
+    async def invest(amount: int) -> None:
+        async with AsyncSessionLocal() as session:
+            await investment(
+                Donation(full_amount=amount, user_id=bench_user.id),
+                charity_project_crud,
+                session,
+            )
+
+    def post(url: str, payload: Callable[[int], dict]):
+        def operation(number: int) -> None:
+            client.post(url, json=payload(number)).raise_for_status()
+        return operation
+
+    # Donations close two projects and half-fill a third, new projects
+    # collect the remains of a dozen open donations.
+    donation_amount = PROJECT_AMOUNT + PROJECT_AMOUNT // 4
+    return {
+        'investment': (
+            Donation, CharityProject,
+            lambda number: client.portal.call(invest, donation_amount),
+        ),
+        'post_donation': (
+            Donation, CharityProject,
+            post('/donation/', lambda number: {
+                'full_amount': donation_amount,
+            }),
+        ),
+        'post_charity_project': (
+            CharityProject, Donation,
+            post('/charity_project/', lambda number: {
+                'name': f'bench {number}',
+                'description': 'bench',
+                'full_amount': DONATION_AMOUNT * 6,
+            }),
+        ),
+    }
+
+
+def main(sizes: List[int], requests: int, warmup: int) -> None:
+    app.dependency_overrides[current_user] = lambda: bench_user
+    app.dependency_overrides[current_superuser] = lambda: bench_user
+    seed(0, CharityProject, Donation)
+    with TestClient(app) as client:
+        for name, (
+            closed_model, open_model, operation
+        ) in scenarios(client).items():
+            for size in sizes:
+                seed(size, open_model, closed_model)
+                result = measure(operation, requests, warmup)
+                print(json.dumps({
+                    'scenario': name,
+                    'backlog': size,
+                    'investment_mode': settings.investment_mode,
+                    'requests': requests,
+                    **result,
+                }), flush=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--sizes', type=int, nargs='+', default=[1000, 10000, 100000]
+    )
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--warmup', type=int, default=5)
+    args = parser.parse_args()
+    main(args.sizes, args.requests, args.warmup)
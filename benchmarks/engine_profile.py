@@ -0,0 +1,80 @@
+"""
+Write throughput of the default engine against the tuned engine profile.
+
+Every worker commits donations one by one, like POST /donation/ does:
+
+    python -m benchmarks.engine_profile --workers 8 --writes 200
+"""
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.base import Base
+from app.core.config import settings
+from app.core.db import create_tuned_engine
+from app.models import Donation
+
+
+async def run_profile(name: str, database_url: str, workers: int,
+                      writes: int) -> dict:
+    if name == 'default':
+        engine = create_async_engine(database_url)
+        expire_on_commit = True
+    else:
+        engine = create_tuned_engine(database_url)
+        expire_on_commit = settings.session_expire_on_commit
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = sessionmaker(
+        engine, class_=AsyncSession, expire_on_commit=expire_on_commit
+    )
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        for _ in range(writes):
+            async with session_factory() as session:
+                donation = Donation(full_amount=100)
+                session.add(donation)
+                try:
+                    await session.commit()
+                    if expire_on_commit:
+                        await session.refresh(donation)
+                except Exception:
+                    errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    elapsed = time.perf_counter() - started
+    await engine.dispose()
+    committed = workers * writes - errors
+    return {
+        'profile': name,
+        'workers': workers,
+        'committed': committed,
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'writes_per_second': round(committed / elapsed, 1),
+    }
+
+
+async def main(workers: int, writes: int) -> None:
+    for name in ('default', 'tuned'):
+        with tempfile.TemporaryDirectory() as tmp:
+            database_url = f'sqlite+aiosqlite:///{Path(tmp) / "bench.db"}'
+            result = await run_profile(name, database_url, workers, writes)
+        print(json.dumps(result))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--writes', type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.workers, args.writes))
@@ -0,0 +1,110 @@
+"""
+Donation request latency while a burst of logins hashes passwords.
+
+Runs the app with uvicorn on a temporary SQLite database and compares
+POST /donation/ latency at rest and during concurrent logins:
+
+    PASSWORD_HASH_EXECUTOR=inline python -m benchmarks.login_burst
+    PASSWORD_HASH_EXECUTOR=thread python -m benchmarks.login_burst
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+import uvicorn
+from sqlalchemy import create_engine
+
+TMP_DIR = tempfile.TemporaryDirectory()
+DATABASE_PATH = Path(TMP_DIR.name) / 'bench.db'
+os.environ['DATABASE_URL'] = f'sqlite+aiosqlite:///{DATABASE_PATH}'
+
+from app.core.base import Base  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.main import app  # noqa: E402
+
+EMAIL = 'bench@example.com'
+PASSWORD = 'chimichangas4life'
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def percentiles(latencies: list) -> dict:
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        'p50_ms': round(quantiles[49] * 1000, 2),
+        'p95_ms': round(quantiles[94] * 1000, 2),
+    }
+
+
+def donation_latencies(base_url: str, headers: dict, count: int) -> list:
+    latencies = []
+    for _ in range(count):
+        started = time.perf_counter()
+        requests.post(
+            f'{base_url}/donation/', json={'full_amount': 10},
+            headers=headers,
+        ).raise_for_status()
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def main(donations: int, logins: int, login_workers: int) -> None:
+    Base.metadata.create_all(create_engine(f'sqlite:///{DATABASE_PATH}'))
+    port = free_port()
+    server = uvicorn.Server(
+        uvicorn.Config(app, port=port, log_level='warning')
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    base_url = f'http://127.0.0.1:{port}'
+    credentials = {'username': EMAIL, 'password': PASSWORD}
+
+    def login() -> str:
+        response = requests.post(f'{base_url}/auth/jwt/login', data=credentials)
+        response.raise_for_status()
+        return response.json()['access_token']
+
+    requests.post(
+        f'{base_url}/auth/register',
+        json={'email': EMAIL, 'password': PASSWORD},
+    ).raise_for_status()
+    headers = {'Authorization': f'Bearer {login()}'}
+
+    at_rest = donation_latencies(base_url, headers, donations)
+    with ThreadPoolExecutor(max_workers=login_workers) as pool:
+        burst = [pool.submit(login) for _ in range(logins)]
+        during_burst = donation_latencies(base_url, headers, donations)
+        for future in burst:
+            future.result()
+
+    server.should_exit = True
+    thread.join()
+    print(json.dumps({
+        'password_hash_executor': settings.password_hash_executor,
+        'logins': logins,
+        'at_rest': percentiles(at_rest),
+        'during_login_burst': percentiles(during_burst),
+    }))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--donations', type=int, default=50)
+    parser.add_argument('--logins', type=int, default=40)
+    parser.add_argument('--login-workers', type=int, default=8)
+    args = parser.parse_args()
+    main(args.donations, args.logins, args.login_workers)
@@ -0,0 +1,133 @@
+"""
+List serialization: the response model path against `dump_rows`.
+
+Loads the rows once from an in-memory SQLite database and times only the
+rendering of the response body, as GET /charity_project/ and
+GET /donation/ do it:
+
+    python -m benchmarks.serialization --sizes 100 1000 10000
+
+Prints one JSON line per schema and list size with the best time of every
+path and the speedup of the column tuples path.
+"""
+import argparse
+import json
+import timeit
+from datetime import datetime, timedelta
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+
+from app.api import serialization
+from app.core.base import Base
+from app.models import CharityProject, Donation
+from app.schemas.charity_project import CharityProjectDB
+from app.schemas.donation import DonationDB
+
+
+def seed(conn, size: int) -> None:
+    start = datetime(2020, 1, 1, 12, 30, 15, 250000)
+    projects, donations = [], []
+    for number in range(size):
+        create_date = start + timedelta(minutes=number)
+        # Every other object is closed, so exclude_none has work to do.
+        close_date = create_date + timedelta(days=1) if number % 2 else None
+        projects.append({
+            'name': f'project {number}',
+            'description': 'Корм для приюта',
+            'full_amount': 1000,
+            'invested_amount': 1000 if close_date else 500,
+            'fully_invested': close_date is not None,
+            'create_date': create_date,
+            'close_date': close_date,
+            'version': 1,
+        })
+        donations.append({
+            'user_id': 1,
+            'comment': None if number % 3 else 'Для котиков',
+            'full_amount': 100,
+            'invested_amount': 100 if close_date else 0,
+            'fully_invested': close_date is not None,
+            'create_date': create_date,
+            'close_date': close_date,
+            'version': 1,
+        })
+    conn.execute(insert(CharityProject.__table__), projects)
+    conn.execute(insert(Donation.__table__), donations)
+
+
+def response_model(db_objs, schema) -> bytes:
+    return JSONResponse(jsonable_encoder(
+        [schema.from_orm(db_obj) for db_obj in db_objs], exclude_none=True
+    )).body
+
+
+def best_ms(render, repeat: int) -> float:
+    return round(min(timeit.repeat(render, number=1, repeat=repeat)) * 1000, 3)
+
+
+def main(sizes: List[int], repeat: int) -> None:
+    sync_engine = create_engine('sqlite://')
+    Base.metadata.create_all(sync_engine)
+    for size in sizes:
+        with sync_engine.begin() as conn:
+            for table in reversed(Base.metadata.sorted_tables):
+                conn.execute(table.delete())
+            seed(conn, size)
+        for model, schema in (
+            (CharityProject, CharityProjectDB), (Donation, DonationDB)
+        ):
+            columns = serialization.schema_columns(schema)
+            with Session(sync_engine) as session:
+                db_objs = session.scalars(
+                    select(model).order_by(model.id)
+                ).all()
+                rows = session.execute(
+                    select(*(getattr(model, column) for column in columns))
+                    .order_by(model.id)
+                ).all()
+            assert serialization.dump_rows(
+                rows, schema, exclude_none=True
+            ) == response_model(db_objs, schema)
+            timings = {
+                'response_model_ms': best_ms(
+                    lambda: response_model(db_objs, schema), repeat
+                ),
+                'dump_orm_objects_ms': best_ms(
+                    lambda: serialization.dump_rows(
+                        db_objs, schema, exclude_none=True
+                    ),
+                    repeat,
+                ),
+                'dump_rows_ms': best_ms(
+                    lambda: serialization.dump_rows(
+                        rows, schema, exclude_none=True
+                    ),
+                    repeat,
+                ),
+            }
+            print(json.dumps({
+                'schema': schema.__name__,
+                'rows': size,
+                'encoder': (
+                    'orjson' if serialization.orjson is not None else 'json'
+                ),
+                **timings,
+                'speedup': round(
+                    timings['response_model_ms'] / timings['dump_rows_ms'], 1
+                ),
+            }), flush=True)
+    sync_engine.dispose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--sizes', type=int, nargs='+', default=[100, 1000, 10000]
+    )
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    main(args.sizes, args.repeat)
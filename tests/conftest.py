@@ -16,10 +16,10 @@ except (NameError, ImportError):
     )
 
 try:
-    from app.core.db import Base, get_async_session
+    from app.core.db import Base, get_async_session, get_read_session
 except (NameError, ImportError):
     raise AssertionError(
-        '`Base, get_async_session` objects were not found. '
+        '`Base, get_async_session, get_read_session` objects were not found. '
         'Check and correct: they should be available in the `app.core.db` module.',
     )
 
@@ -1,3 +1,16 @@
+import asyncio
+import threading
+
+import pytest
+from conftest import TestingSessionLocal, engine
+from fastapi_users_db_sqlalchemy import SQLAlchemyUserDatabase
+from sqlalchemy import event
+
+from app.core import password
+from app.core.password import password_hasher, password_helper
+from app.core.user import UserManager, token_cache, user_cache
+from app.models import User
+from app.schemas.user import UserUpdate
 
 
 def test_register(test_client):
@@ -40,3 +53,75 @@ def test_register_invalid_pass(user_client):
             'reason': 'Password should be at least 3 characters',
         },
     }, 'In case of incorrect user registration, API response body is different from expected.'
+
+
+@pytest.fixture
+def clear_auth_cache():
+    token_cache.clear()
+    user_cache.clear()
+    yield
+    token_cache.clear()
+    user_cache.clear()
+
+
+def login(client):
+    client.post('/auth/register', json={
+        'email': 'dead@pool.com',
+        'password': 'chimichangas4life',
+    })
+    response = client.post('/auth/jwt/login', data={
+        'username': 'dead@pool.com',
+        'password': 'chimichangas4life',
+    })
+    return {'Authorization': f'Bearer {response.json()["access_token"]}'}
+
+
+async def deactivate(email):
+    async with TestingSessionLocal() as session:
+        user_manager = UserManager(SQLAlchemyUserDatabase(session, User))
+        user = await user_manager.get_by_email(email)
+        await user_manager.update(UserUpdate(is_active=False), user)
+
+
+def test_authenticated_user_is_cached(test_client, clear_auth_cache):
+    headers = login(test_client)
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, 'before_cursor_execute', capture)
+    try:
+        first = test_client.get('/users/me', headers=headers)
+        second = test_client.get('/users/me', headers=headers)
+    finally:
+        event.remove(engine.sync_engine, 'before_cursor_execute', capture)
+    assert first.status_code == second.status_code == 200
+    assert first.json() == second.json()
+    assert len(statements) == 1, (
+        'A repeated request with the same token must not query the user table.'
+    )
+
+
+def test_deactivated_user_is_not_served_from_cache(test_client, clear_auth_cache):
+    headers = login(test_client)
+    assert test_client.get('/users/me', headers=headers).status_code == 200
+    asyncio.run(deactivate('dead@pool.com'))
+    assert test_client.get('/users/me', headers=headers).status_code == 401, (
+        'Deactivation must invalidate the cached user immediately.'
+    )
+
+
+def test_password_hashing_runs_off_event_loop(monkeypatch, test_client, clear_auth_cache):
+    threads = []
+
+    def recording_hash(password):
+        threads.append(threading.current_thread().name)
+        return password_helper.hash(password)
+
+    monkeypatch.setattr(password, 'hash_password', recording_hash)
+    monkeypatch.setattr(password_hasher, 'executor_type', 'thread')
+    login(test_client)
+    assert threads and all(name.startswith('ThreadPoolExecutor') for name in threads), (
+        'Password hashing must not run in the event loop thread.'
+    )
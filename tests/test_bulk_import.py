@@ -0,0 +1,87 @@
+import asyncio
+import json
+
+import pytest
+from conftest import TestingSessionLocal
+from sqlalchemy import func, select
+
+from app.crud.donation_allocation import donation_allocation_crud
+from app.models import CharityProject, Donation, User
+from app.services.bulk_import import RecordError, allocate_all, import_file
+
+
+def write_jsonl(path, records):
+    path.write_text(''.join(json.dumps(record) + '\n' for record in records))
+    return path
+
+
+def test_bulk_import_resumes_and_allocates_once(tmp_path, superuser_client):
+    users = write_jsonl(tmp_path / 'users.jsonl', [
+        {'email': 'old@example.com', 'hashed_password': 'hash'},
+    ])
+    projects = tmp_path / 'projects.csv'
+    projects.write_text(
+        'name,description,full_amount,create_date\n'
+        'first,Old project,300,2015-01-01T00:00:00\n'
+        'second,Newer project,1000,2016-01-01T00:00:00\n'
+    )
+    donations = [
+        {'full_amount': 200, 'user_email': 'old@example.com',
+         'create_date': f'2015-0{month}-01T00:00:00'}
+        for month in range(1, 5)
+    ]
+    write_jsonl(tmp_path / 'donations.jsonl', [
+        *donations, {'full_amount': 100, 'user_email': 'nobody@example.com'},
+    ])
+    asyncio.run(import_file(TestingSessionLocal, 'users', users))
+    asyncio.run(import_file(TestingSessionLocal, 'projects', projects))
+    with pytest.raises(RecordError, match='records 5-5'):
+        asyncio.run(import_file(
+            TestingSessionLocal, 'donations', tmp_path / 'donations.jsonl',
+            chunk_size=2,
+        ))
+    write_jsonl(tmp_path / 'donations.jsonl', donations)
+    imported = asyncio.run(import_file(
+        TestingSessionLocal, 'donations', tmp_path / 'donations.jsonl',
+        chunk_size=2,
+    ))
+    assert imported == 4, (
+        'A resumed import must continue after the last committed chunk.'
+    )
+
+    async def counts():
+        async with TestingSessionLocal() as session:
+            return [
+                await session.scalar(select(func.count(model.id)))
+                for model in (User, CharityProject, Donation)
+            ]
+
+    assert asyncio.run(counts()) == [1, 2, 4], (
+        'Every record must be imported exactly once.'
+    )
+    report = asyncio.run(allocate_all(TestingSessionLocal, chunk_size=2))
+    assert report.checked['donation_allocation'] == 5
+    data = superuser_client.get('/charity_project/').json()
+    assert [
+        (project['invested_amount'], project['fully_invested'])
+        for project in data
+    ] == [(300, True), (500, False)], (
+        'The allocation pass must distribute the imported donations in '
+        'creation order.'
+    )
+    assert data[0]['close_date'] == '2015-02-01T00:00:00'
+
+    async def ledger():
+        async with TestingSessionLocal() as session:
+            return [
+                (entry.donation_id, entry.amount)
+                for entry in await donation_allocation_crud.get_by_project(
+                    1, session
+                )
+            ]
+
+    assert asyncio.run(ledger()) == [(1, 200), (2, 100)], (
+        'The allocation pass must record the imported transfers in the '
+        'ledger.'
+    )
+    assert superuser_client.get('/stats/').json()['donors'] == 1
@@ -1,6 +1,15 @@
+import json
 from datetime import datetime
 
 import pytest
+from conftest import app, current_user, engine, get_async_session
+from fixtures.user import user
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.api.endpoints import charity_project as charity_project_endpoints
 
 
 @pytest.mark.parametrize(
@@ -430,6 +439,21 @@ def test_update_charity_project_same_name(superuser_client, charity_project, cha
     }
 
 
+def test_create_project_other_integrity_error_is_not_a_duplicate(superuser_client, monkeypatch):
+    async def broken_investment(obj_in, invest_in, session):
+        raise IntegrityError(
+            'INSERT', {}, Exception('FOREIGN KEY constraint failed')
+        )
+
+    monkeypatch.setattr(charity_project_endpoints, 'investment', broken_investment)
+    with pytest.raises(IntegrityError):
+        superuser_client.post('/charity_project/', json={
+            'name': 'chimichangas4life',
+            'description': 'Huge fan of chimichangas',
+            'full_amount': 1000,
+        })
+
+
 @pytest.mark.parametrize('full_amount', [
     0,
     5,
@@ -621,3 +645,163 @@ def test_get_all_charity_project_not_auth_user(test_client, charity_project, cha
             'name': 'nunchaku'
         }
     ]
+
+
+def test_get_charity_projects_keyset_pagination(test_client, charity_project, charity_project_nunchaku):
+    response = test_client.get('/charity_project/', params={'limit': 1})
+    assert [project['id'] for project in response.json()] == [1], (
+        '`limit` must restrict the number of returned projects.'
+    )
+    response = test_client.get('/charity_project/', params={'limit': 1, 'after': 1})
+    assert [project['id'] for project in response.json()] == [2], (
+        '`after` must return projects following the given id.'
+    )
+    response = test_client.get('/charity_project/', params={'after': 2})
+    assert response.json() == []
+
+
+def test_get_charity_projects_ndjson(test_client, charity_project, charity_project_nunchaku):
+    response = test_client.get(
+        '/charity_project/', headers={'Accept': 'application/x-ndjson'}
+    )
+    assert response.status_code == 200
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines == test_client.get('/charity_project/').json(), (
+        'Streamed projects must match the JSON list response.'
+    )
+
+
+def test_get_charity_projects_sparse_fields(test_client, charity_project, charity_project_nunchaku):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, 'before_cursor_execute', capture)
+    try:
+        response = test_client.get(
+            '/charity_project/', params={'fields': 'name,invested_amount'}
+        )
+    finally:
+        event.remove(engine.sync_engine, 'before_cursor_execute', capture)
+    assert response.json() == [
+        {'name': 'chimichangas4life', 'id': 1, 'invested_amount': 0},
+        {'name': 'nunchaku', 'id': 2, 'invested_amount': 0},
+    ], '`fields` must narrow the returned projects to the listed fields and id.'
+    assert all('description' not in statement for statement in statements), (
+        'Fields that were not requested must not be loaded from the database.'
+    )
+    response = test_client.get(
+        '/charity_project/',
+        params={'fields': 'name'},
+        headers={'Accept': 'application/x-ndjson'},
+    )
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines == [
+        {'name': 'chimichangas4life', 'id': 1},
+        {'name': 'nunchaku', 'id': 2},
+    ], 'Streamed projects must support `fields` as well.'
+    response = test_client.get(
+        '/charity_project/', params={'fields': 'description'}
+    )
+    assert response.json() == [
+        {'description': 'Huge fan of chimichangas. Wanna buy a lot', 'id': 1},
+        {'description': 'Nunchaku is better', 'id': 2},
+    ], 'Constrained fields must be accepted in `fields` as well.'
+    response = test_client.get(
+        '/charity_project/', params={'fields': 'name,password'}
+    )
+    assert response.status_code == 422, (
+        'Unknown fields in `fields` must be rejected with status code 422.'
+    )
+
+
+def test_get_charity_projects_etag(superuser_client, charity_project):
+    response = superuser_client.get('/charity_project/')
+    etag = response.headers['etag']
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, 'before_cursor_execute', capture)
+    try:
+        response = superuser_client.get(
+            '/charity_project/', headers={'If-None-Match': etag}
+        )
+    finally:
+        event.remove(engine.sync_engine, 'before_cursor_execute', capture)
+    assert response.status_code == 304, (
+        'A request with the current ETag in `If-None-Match` must return 304.'
+    )
+    assert statements == [], (
+        'An unchanged project list must be served without database queries.'
+    )
+    superuser_client.patch('/charity_project/1', json={'description': 'New'})
+    response = superuser_client.get(
+        '/charity_project/', headers={'If-None-Match': etag}
+    )
+    assert response.status_code == 200, (
+        'Editing a project must change the ETag of the project list.'
+    )
+    assert response.json()[0]['description'] == 'New'
+    assert response.headers['etag'] != etag
+
+
+def test_get_fastest_closed_projects(superuser_client, freezer):
+    app.dependency_overrides[current_user] = lambda: user
+    freezer.move_to('2010-10-10')
+    for name, full_amount in (('fast', 100), ('slow', 300), ('open', 1000)):
+        superuser_client.post('/charity_project/', json={
+            'name': name, 'description': name, 'full_amount': full_amount,
+        })
+    freezer.move_to('2010-10-10 00:01:00')
+    superuser_client.post('/donation/', json={'full_amount': 100})
+    freezer.move_to('2010-10-10 00:30:00')
+    superuser_client.post('/donation/', json={'full_amount': 300})
+    response = superuser_client.get('/charity_project/fastest')
+    assert response.status_code == 200
+    assert [
+        (project['name'], project['duration']) for project in response.json()
+    ] == [('fast', 60), ('slow', 1800)], (
+        'Closed projects must be ranked by their funding time.'
+    )
+    response = superuser_client.get(
+        '/charity_project/fastest', params={'limit': 1, 'after': 1}
+    )
+    assert [project['name'] for project in response.json()] == ['slow'], (
+        'The ranking must support keyset pagination.'
+    )
+
+
+def test_update_charity_project_statement_count(superuser_client, charity_project):
+    session_factory = sessionmaker(
+        class_=AsyncSession, bind=engine, expire_on_commit=False,
+    )
+
+    async def app_session():
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_async_session] = app_session
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement.split()[0])
+
+    event.listen(engine.sync_engine, 'before_cursor_execute', capture)
+    try:
+        response = superuser_client.patch('/charity_project/1', json={
+            'name': 'chimichangas4life', 'full_amount': 2000000,
+        })
+    finally:
+        event.remove(engine.sync_engine, 'before_cursor_execute', capture)
+    assert response.status_code == 200, (
+        'A project must keep its own name when edited.'
+    )
+    assert response.json()['full_amount'] == 2000000
+    assert sorted(statements) == ['SELECT', 'UPDATE'], (
+        'Editing a project must take one conditional UPDATE and reading '
+        'the row back, without pre-check queries.'
+    )
@@ -1,4 +1,23 @@
-from conftest import BASE_DIR
+import logging
+import re
+
+import pytest
+from conftest import BASE_DIR, TestingSessionLocal, engine
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+from app.api import serialization
+from app.core.config import settings
+from app.core.db import create_tuned_engine, engine_options
+from app.core.sql_timing import instrument
+from app.crud.charity_project import charity_project_crud
+from app.crud.donation import donation_crud
+from app.crud.donation_allocation import donation_allocation_crud
+from app.models import User
+from app.schemas.charity_project import CharityProjectDB
+from app.schemas.donation import DonationDB
 
 
 try:
@@ -50,3 +69,160 @@ def test_check_db_url():
             assert 'sqlite+aiosqlite' in attr_value['default'], (
                 'Specify default value for sqlite database connection '
             )
+
+
+async def query_plan(query):
+    """Capture the last statement of `query` and return its query plan."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine.sync_engine, 'before_cursor_execute', capture)
+    try:
+        async with TestingSessionLocal() as session:
+            await query(session)
+    finally:
+        event.remove(engine.sync_engine, 'before_cursor_execute', capture)
+    statement, parameters = statements[-1]
+    async with engine.connect() as conn:
+        plan = await conn.exec_driver_sql(
+            f'EXPLAIN QUERY PLAN {statement}', parameters
+        )
+        return ' | '.join(row[-1] for row in plan)
+
+
+@pytest.mark.parametrize('crud, index', [
+    (charity_project_crud, 'ix_charityproject_open_create_date'),
+    (donation_crud, 'ix_donation_open_create_date'),
+])
+async def test_get_multi_open_uses_index(crud, index):
+    plan = await query_plan(crud.get_multi_open)
+    assert f'USING INDEX {index}' in plan, (
+        f'Open objects must be read through `{index}`, got plan: {plan}'
+    )
+    assert 'TEMP B-TREE' not in plan, (
+        f'Open objects must be ordered by the index, got plan: {plan}'
+    )
+
+
+async def test_get_by_user_uses_index():
+    plan = await query_plan(
+        lambda session: donation_crud.get_by_user(session, User(id=1))
+    )
+    assert 'USING INDEX ix_donation_user_id_id' in plan, (
+        f'User donations must be read through the index, got plan: {plan}'
+    )
+    assert 'TEMP B-TREE' not in plan, (
+        f'User donations must be ordered by the index, got plan: {plan}'
+    )
+
+
+@pytest.mark.parametrize('lookup, index', [
+    (donation_allocation_crud.get_by_project,
+     'ix_donation_allocation_project_id_donation_id'),
+    (donation_allocation_crud.get_by_donation,
+     'ix_donation_allocation_donation_id_project_id'),
+])
+async def test_allocation_ledger_uses_index(lookup, index):
+    plan = await query_plan(lambda session: lookup(1, session))
+    assert f'USING INDEX {index}' in plan, (
+        f'Ledger lookups must be read through `{index}`, got plan: {plan}'
+    )
+    assert 'TEMP B-TREE' not in plan, (
+        f'Ledger lookups must be ordered by the index, got plan: {plan}'
+    )
+
+
+@pytest.mark.parametrize('after', [None, 1])
+async def test_get_fastest_closed_uses_index(after):
+    plan = await query_plan(
+        lambda session: charity_project_crud.get_fastest_closed(
+            session, 10, after
+        )
+    )
+    assert 'USING INDEX ix_charityproject_closed_duration' in plan, (
+        f'The ranking must be read through the index, got plan: {plan}'
+    )
+    assert 'TEMP B-TREE' not in plan, (
+        f'The ranking must be ordered by the index, got plan: {plan}'
+    )
+
+
+async def test_tuned_engine_pragmas(tmp_path):
+    tuned_engine = create_tuned_engine(f'sqlite+aiosqlite:///{tmp_path / "tuned.db"}')
+    async with tuned_engine.connect() as conn:
+        journal_mode = (await conn.exec_driver_sql('PRAGMA journal_mode')).scalar()
+        busy_timeout = (await conn.exec_driver_sql('PRAGMA busy_timeout')).scalar()
+    await tuned_engine.dispose()
+    assert journal_mode == ('wal' if Settings().engine_wal else 'delete')
+    assert busy_timeout == Settings().engine_busy_timeout
+
+
+@pytest.mark.parametrize('url, pre_ping', [
+    ('sqlite+aiosqlite:///./fastapi.db', False),
+    ('postgresql+asyncpg://user:password@db/fund', True),
+])
+def test_pool_pre_ping_only_for_network_backends(url, pre_ping):
+    assert engine_options(url).get('pool_pre_ping', False) is pre_ping, (
+        'Only network connections must be pinged on checkout.'
+    )
+
+
+async def test_read_only_engine(tmp_path):
+    database_url = f'sqlite+aiosqlite:///{tmp_path / "replica.db"}'
+    tuned_engine = create_tuned_engine(database_url)
+    async with tuned_engine.begin() as conn:
+        await conn.exec_driver_sql('CREATE TABLE item (id INTEGER)')
+    await tuned_engine.dispose()
+    read_engine = create_tuned_engine(database_url, read_only=True)
+    async with read_engine.connect() as conn:
+        assert (await conn.exec_driver_sql('SELECT count(*) FROM item')).scalar() == 0
+        with pytest.raises(OperationalError):
+            await conn.exec_driver_sql('INSERT INTO item VALUES (1)')
+    await read_engine.dispose()
+
+
+def test_sql_timing(user_client, monkeypatch, caplog):
+    response = user_client.get('/donation/my')
+    assert 'server-timing' not in response.headers, (
+        'SQL timing must be disabled by default.'
+    )
+    monkeypatch.setattr(settings, 'sql_timing', True)
+    instrument(engine)
+    with caplog.at_level(logging.INFO, logger='app.access'):
+        response = user_client.get('/donation/my')
+    match = re.fullmatch(
+        r'db;dur=[\d.]+;desc="(\d+) statements"',
+        response.headers.get('server-timing', ''),
+    )
+    assert match and match[1] == '1', (
+        'The Server-Timing header must report the statements of the request.'
+    )
+    assert 'GET /donation/my 200 1 statements' in caplog.text, (
+        'The access log must report the statements of the request.'
+    )
+
+
+@pytest.mark.parametrize('encoder', ['orjson', 'json'])
+@pytest.mark.parametrize('crud, schema', [
+    (charity_project_crud, CharityProjectDB),
+    (donation_crud, DonationDB),
+])
+async def test_dump_rows_matches_response_model(
+    crud, schema, encoder, monkeypatch, charity_project,
+    small_fully_charity_project, donation, another_donation,
+):
+    if encoder == 'json':
+        monkeypatch.setattr(serialization, 'orjson', None)
+    async with TestingSessionLocal() as session:
+        db_objs = await crud.get_multi(session)
+        rows = await crud.get_multi_rows(
+            session, serialization.schema_columns(schema)
+        )
+    expected = JSONResponse(jsonable_encoder(
+        [schema.from_orm(db_obj) for db_obj in db_objs], exclude_none=True
+    )).body
+    assert serialization.dump_rows(rows, schema, exclude_none=True) == expected, (
+        'The fast list serializer must render the same JSON as the response model.'
+    )
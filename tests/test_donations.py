@@ -1,6 +1,16 @@
+import asyncio
+import json
 from datetime import datetime
 
 import pytest
+from conftest import TestingSessionLocal, app, engine, get_async_session
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.core.cache import data_version
+from app.core.config import settings
+from app.services.intake import intake_worker
 
 
 @pytest.mark.parametrize('json, keys, expected_data', [
@@ -178,3 +188,83 @@ def test_create_donation_check_create_date(user_client):
     assert response_1.json()['create_date'] != response_2.json()['create_date'], (
         'When creating 2 donations with a pause (of 1 second, for example), they must have different `create_date`'
     )
+
+
+def test_get_my_donations_pagination_and_ndjson(user_client):
+    for full_amount in (10, 20, 30):
+        user_client.post('/donation/', json={'full_amount': full_amount})
+    response = user_client.get('/donation/my', params={'limit': 2, 'after': 1})
+    assert [item['full_amount'] for item in response.json()] == [20, 30], (
+        'User donations must support keyset pagination.'
+    )
+    response = user_client.get(
+        '/donation/my', headers={'Accept': 'application/x-ndjson'}
+    )
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines == user_client.get('/donation/my').json(), (
+        'Streamed donations must match the JSON list response.'
+    )
+
+
+def test_create_donation_statement_count(user_client, charity_project):
+    session_factory = sessionmaker(
+        class_=AsyncSession, bind=engine, expire_on_commit=False,
+    )
+
+    async def app_session():
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_async_session] = app_session
+    # The first write creates the fund statistics row.
+    user_client.post('/donation/', json={'full_amount': 100})
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement.split()[0])
+
+    event.listen(engine.sync_engine, 'before_cursor_execute', capture)
+    try:
+        response = user_client.post('/donation/', json={'full_amount': 100})
+    finally:
+        event.remove(engine.sync_engine, 'before_cursor_execute', capture)
+    assert response.status_code == 200
+    assert response.json()['full_amount'] == 100
+    assert sorted(statements) == [
+        'INSERT', 'INSERT', 'SELECT', 'UPDATE', 'UPDATE'
+    ], (
+        'Creating a donation must read the open projects, insert the '
+        'allocated donation and its ledger entries, update the touched '
+        'project and the fund statistics, nothing more.'
+    )
+    assert user_client.get('/charity_project/').json()[0]['invested_amount'] == 200
+
+
+def test_create_donation_async_intake(user_client, charity_project, monkeypatch):
+    monkeypatch.setattr(settings, 'donation_intake', 'async')
+    monkeypatch.setattr(intake_worker, 'session_factory', TestingSessionLocal)
+    version = data_version.value
+    response = user_client.post('/donation/', json={'full_amount': 100})
+    assert response.status_code == 202, (
+        'In the async intake mode donations must only be accepted.'
+    )
+    assert data_version.value == version, (
+        'Accepting a donation must not invalidate the cached project lists.'
+    )
+    assert response.json()['status'] == 'pending'
+    status_url = response.headers['location']
+    assert user_client.get('/charity_project/').json()[0]['invested_amount'] == 0
+    assert asyncio.run(intake_worker.drain()) == 1
+    response = user_client.get(status_url)
+    assert response.json()['status'] == 'allocated', (
+        'The intake worker must allocate the accepted donations.'
+    )
+    donations = user_client.get('/donation/my').json()
+    assert [donation['id'] for donation in donations] == [
+        response.json()['donation_id']
+    ]
+    assert user_client.get('/charity_project/').json()[0]['invested_amount'] == 100
+    assert asyncio.run(intake_worker.drain()) == 0, (
+        'Allocated intakes must not be allocated again.'
+    )
@@ -0,0 +1,62 @@
+from conftest import app, current_user
+from fixtures.user import user
+
+
+def test_get_fund_stats_without_writes(
+    user_client, charity_project, small_fully_charity_project
+):
+    response = user_client.get('/stats/')
+    assert response.status_code == 200
+    assert response.json() == {
+        'raised_amount': 0,
+        'invested_amount': 0,
+        'pending_amount': 0,
+        'open_projects': 1,
+        'closed_projects': 1,
+        'donors': 0,
+    }, 'Without a stored row the statistics must be calculated from the tables.'
+
+
+def test_fund_stats_follow_writes(superuser_client):
+    app.dependency_overrides[current_user] = lambda: user
+    user_client = superuser_client
+    user_client.post('/donation/', json={'full_amount': 100})
+    user_client.post('/donation/', json={'full_amount': 50})
+    superuser_client.post('/charity_project/', json={
+        'name': 'first', 'description': 'closed at once', 'full_amount': 60,
+    })
+    response = superuser_client.post('/charity_project/', json={
+        'name': 'second', 'description': 'partly funded', 'full_amount': 200,
+    })
+    second_id = response.json()['id']
+    assert user_client.get('/stats/').json() == {
+        'raised_amount': 150,
+        'invested_amount': 150,
+        'pending_amount': 0,
+        'open_projects': 1,
+        'closed_projects': 1,
+        'donors': 1,
+    }, 'Allocations must be reflected in the fund statistics.'
+    superuser_client.patch(
+        f'/charity_project/{second_id}', json={'full_amount': 90}
+    )
+    response = superuser_client.post('/charity_project/', json={
+        'name': 'third', 'description': 'to be deleted', 'full_amount': 10,
+    })
+    stats = user_client.get('/stats/').json()
+    assert (stats['open_projects'], stats['closed_projects']) == (1, 2), (
+        'Closing a project by editing it must be counted.'
+    )
+    superuser_client.delete(f'/charity_project/{response.json()["id"]}')
+    stats = user_client.get('/stats/').json()
+    assert (stats['open_projects'], stats['closed_projects']) == (0, 2), (
+        'Deleted projects must not be counted.'
+    )
+
+
+def test_get_fund_stats_without_trailing_slash(user_client):
+    response = user_client.get('/stats', allow_redirects=False)
+    assert response.status_code == 200, (
+        'GET /stats must answer with the statistics, not a redirect.'
+    )
+    assert response.json() == user_client.get('/stats/').json()
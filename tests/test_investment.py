@@ -1,4 +1,21 @@
+import asyncio
+
 import pytest
+from conftest import TestingSessionLocal, app, current_user
+from fixtures.user import user
+from sqlalchemy import delete, update
+
+from app.core.config import settings
+from app.crud import base
+from app.crud.charity_project import charity_project_crud
+from app.crud.donation import donation_crud
+from app.crud.donation_allocation import donation_allocation_crud
+from app.models import CharityProject, Donation, DonationAllocation
+from app.services.allocation_engine import allocation_engine
+from app.services.bulk_import import import_file
+from app.services.group_commit import GroupCommitCoordinator
+from app.services.investment import allocation_coordinator, investment
+from app.services.reconciliation import reconcile
 
 
 def test_donation_exist_non_project(superuser_client, donation):
@@ -53,3 +70,386 @@ def test_donation_to_little_invest_project(user_client, charity_project_little_i
     assert charity_project_little_invested.invested_amount == 1000, test_donation_to_little_invest_project.__doc__
     assert not charity_project_nunchaku.fully_invested, test_donation_to_little_invest_project.__doc__
     assert charity_project_nunchaku.invested_amount == 0, test_donation_to_little_invest_project.__doc__
+
+
+@pytest.fixture
+def memory_mode(monkeypatch):
+    monkeypatch.setattr(settings, 'investment_mode', 'memory')
+    allocation_engine.loaded = False
+    yield
+    allocation_engine.loaded = False
+
+
+def test_memory_mode_fully_invested_amount_for_two_projects(user_client, charity_project, charity_project_nunchaku, memory_mode):
+    user_client.post('/donation/', json={'full_amount': 500000})
+    user_client.post('/donation/', json={'full_amount': 600000})
+    assert charity_project.fully_invested, (
+        'In memory mode donations must be distributed in FIFO order as well.'
+    )
+    assert charity_project_nunchaku.invested_amount == 100000, (
+        'In memory mode the rest of a donation must go to the next open project.'
+    )
+    assert list(allocation_engine.queues[CharityProject]) == [charity_project_nunchaku.id], (
+        'Closed projects must leave the in-memory queue.'
+    )
+
+
+def test_memory_mode_project_takes_pending_donations(superuser_client, donation, another_donation, memory_mode):
+    response = superuser_client.post('/charity_project/', json={
+        'name': 'chimichangas4life',
+        'description': 'Huge fan of chimichangas',
+        'full_amount': 1000,
+    })
+    data = response.json()
+    assert data['fully_invested'], (
+        'In memory mode a new project must collect pending donations.'
+    )
+    donations = {item['id']: item for item in superuser_client.get('/donation/').json()}
+    assert donations[donation.id]['fully_invested']
+    assert donations[another_donation.id]['invested_amount'] == 900
+    assert list(allocation_engine.queues[Donation]) == [another_donation.id]
+
+
+def test_memory_mode_deleted_project_leaves_queue(superuser_client, charity_project, memory_mode):
+    project_id = superuser_client.post('/charity_project/', json={
+        'name': 'nunchaku',
+        'description': 'Nunchaku is better',
+        'full_amount': 1000,
+    }).json()['id']
+    assert list(allocation_engine.queues[CharityProject]) == [charity_project.id, project_id], (
+        'New open projects must be appended to the in-memory queue.'
+    )
+    superuser_client.delete(f'/charity_project/{project_id}')
+    assert list(allocation_engine.queues[CharityProject]) == [charity_project.id], (
+        'Deleted projects must leave the in-memory queue.'
+    )
+
+
+def test_donation_batch_fifo(user_client, charity_project_little_invested, charity_project_nunchaku):
+    response = user_client.post('/donation/batch', json=[
+        {'full_amount': 999000},
+        {'full_amount': 1000, 'comment': 'To you for chimichangas'},
+        {'full_amount': 500},
+    ])
+    assert response.status_code == 200, (
+        'Creating a batch of donations should return status code 200.'
+    )
+    data = response.json()
+    assert [item['full_amount'] for item in data] == [999000, 1000, 500], (
+        'Batch response must keep the order of the donations.'
+    )
+    assert charity_project_little_invested.fully_invested, (
+        'Batch donations must close projects in FIFO order.'
+    )
+    assert charity_project_nunchaku.invested_amount == 600, (
+        'The rest of the batch must go to the next open project.'
+    )
+    assert len(user_client.get('/donation/my').json()) == 3
+
+
+def test_donation_batch_memory_mode(user_client, charity_project, charity_project_nunchaku, memory_mode):
+    user_client.post('/donation/batch', json=[
+        {'full_amount': 700000},
+        {'full_amount': 700000},
+    ])
+    assert charity_project.fully_invested
+    assert charity_project_nunchaku.invested_amount == 400000
+    assert list(allocation_engine.queues[CharityProject]) == [charity_project_nunchaku.id]
+
+
+async def fund_project(project_id, amount):
+    """Another worker invests into the project meanwhile."""
+    async with TestingSessionLocal() as session:
+        project = await session.get(CharityProject, project_id)
+        project.invested_amount += amount
+        await session.commit()
+
+
+def test_concurrent_allocation_is_retried(monkeypatch, user_client, charity_project, charity_project_nunchaku):
+    get_multi_open = charity_project_crud.get_multi_open
+    calls = []
+
+    async def racing_get_multi_open(session):
+        objects = await get_multi_open(session)
+        if not calls:
+            await fund_project(1, 999000)
+        calls.append(objects)
+        return objects
+
+    monkeypatch.setattr(charity_project_crud, 'get_multi_open', racing_get_multi_open)
+    user_client.post('/donation/', json={'full_amount': 2000})
+    assert len(calls) == 2, (
+        'Allocation must be retried when the open rows were changed concurrently.'
+    )
+    projects = user_client.get('/charity_project/').json()
+    assert projects[0]['invested_amount'] == 1000000 and projects[0]['fully_invested'], (
+        'A retried allocation must not overwrite concurrent investments.'
+    )
+    assert projects[1]['invested_amount'] == 1000
+
+
+def test_memory_mode_concurrent_allocation_is_retried(user_client, charity_project, charity_project_nunchaku, memory_mode):
+    user_client.post('/donation/', json={'full_amount': 1000})
+    asyncio.run(fund_project(1, 998000))
+    user_client.post('/donation/', json={'full_amount': 2000})
+    projects = user_client.get('/charity_project/').json()
+    assert projects[0]['invested_amount'] == 1000000 and projects[0]['fully_invested'], (
+        'A stale in-memory queue must be reloaded when the version check fails.'
+    )
+    assert projects[1]['invested_amount'] == 1000
+    assert list(allocation_engine.queues[CharityProject]) == [2]
+
+
+def test_memory_mode_sees_rows_of_other_processes(user_client, memory_mode, monkeypatch, tmp_path):
+    loads = []
+    load = allocation_engine.load
+
+    async def counting_load(session):
+        loads.append(1)
+        await load(session)
+
+    monkeypatch.setattr(allocation_engine, 'load', counting_load)
+    user_client.post('/donation/', json={'full_amount': 1000})
+    user_client.post('/donation/', json={'full_amount': 100})
+    assert len(loads) == 1, (
+        'The in-memory queues must not be reloaded after own allocations.'
+    )
+    projects = tmp_path / 'projects.csv'
+    projects.write_text('name,description,full_amount\nimported,imported,500\n')
+    asyncio.run(import_file(TestingSessionLocal, 'projects', projects))
+    user_client.post('/donation/', json={'full_amount': 300})
+    assert asyncio.run(project_progress()) == [(300, False)], (
+        'The in-memory queue must be reloaded when another process '
+        'inserts open rows.'
+    )
+    assert len(loads) == 2
+
+
+@pytest.fixture
+def sql_mode(monkeypatch):
+    monkeypatch.setattr(settings, 'investment_mode', 'sql')
+
+
+def test_sql_mode_distributes_in_fifo_order(user_client, charity_project_little_invested, charity_project_nunchaku, sql_mode):
+    user_client.post('/donation/', json={'full_amount': 999000})
+    user_client.post('/donation/batch', json=[
+        {'full_amount': 1000},
+        {'full_amount': 500},
+    ])
+    projects = user_client.get('/charity_project/').json()
+    assert projects[0]['fully_invested'] and projects[0]['close_date'], (
+        'In sql mode running totals must close projects in FIFO order.'
+    )
+    assert projects[1]['invested_amount'] == 600, (
+        'In sql mode the rest of the donations must go to the next open project.'
+    )
+
+
+def test_sql_mode_reads_open_objects_in_growing_pages(user_client, charity_project, charity_project_nunchaku, sql_mode, monkeypatch):
+    monkeypatch.setattr(base, 'OPEN_PAGE_SIZE', 1)
+    user_client.post('/donation/', json={'full_amount': 1500000})
+    assert asyncio.run(project_progress()) == [(1000000, True), (500000, False)], (
+        'In sql mode the prefix must grow until the donation is absorbed.'
+    )
+    user_client.post('/donation/', json={'full_amount': 9000000})
+    assert asyncio.run(project_progress()) == [(1000000, True), (5000000, True)], (
+        'In sql mode the prefix must stop at the end of the backlog.'
+    )
+
+
+def test_sql_mode_project_takes_pending_donations(superuser_client, donation, another_donation, sql_mode):
+    response = superuser_client.post('/charity_project/', json={
+        'name': 'chimichangas4life',
+        'description': 'Huge fan of chimichangas',
+        'full_amount': 1000,
+    })
+    assert response.json()['fully_invested']
+    donations = superuser_client.get('/donation/').json()
+    assert donations[0]['fully_invested'], (
+        'In sql mode a new project must close the oldest pending donation.'
+    )
+    assert donations[1]['invested_amount'] == 900
+    assert not donations[1]['fully_invested']
+
+
+async def ledger(crud_method, obj_id):
+    async with TestingSessionLocal() as session:
+        return [
+            (entry.donation_id, entry.project_id, entry.amount)
+            for entry in await crud_method(obj_id, session)
+        ]
+
+
+@pytest.mark.parametrize('mode', [None, 'memory_mode', 'sql_mode'])
+def test_allocation_ledger(request, superuser_client, donation, another_donation, mode):
+    if mode is not None:
+        request.getfixturevalue(mode)
+    app.dependency_overrides[current_user] = lambda: user
+    for name, full_amount in (('first', 1000), ('second', 5000)):
+        superuser_client.post('/charity_project/', json={
+            'name': name, 'description': name, 'full_amount': full_amount,
+        })
+    superuser_client.post('/donation/', json={'full_amount': 500})
+    assert asyncio.run(ledger(donation_allocation_crud.get_by_project, 2)) == [
+        (2, 2, 1100), (3, 2, 500),
+    ], 'The ledger must record every donation behind a project.'
+    assert asyncio.run(ledger(donation_allocation_crud.get_by_donation, 2)) == [
+        (2, 1, 900), (2, 2, 1100),
+    ], 'The ledger must record every project funded by a donation.'
+
+
+async def run_reconcile(dry_run):
+    drifts = []
+    async with TestingSessionLocal() as session:
+        report = await reconcile(
+            session, chunk_size=2, dry_run=dry_run, on_drift=drifts.append
+        )
+        await session.commit()
+    return report, [(drift.model, drift.id) for drift in drifts]
+
+
+async def project_progress():
+    async with TestingSessionLocal() as session:
+        return [
+            (project.invested_amount, project.fully_invested)
+            for project in await charity_project_crud.get_multi(session)
+        ]
+
+
+def test_reconcile_repairs_drift(user_client, charity_project, charity_project_nunchaku):
+    for full_amount in (999000, 1000, 500):
+        user_client.post('/donation/', json={'full_amount': full_amount})
+    expected = user_client.get('/charity_project/').json()
+    report, drifts = asyncio.run(run_reconcile(dry_run=True))
+    assert drifts == [] and report.checked == {
+        'donation_allocation': 3, 'donation': 3, 'charityproject': 2,
+    }, (
+        'The replay of consistent allocations must not report any drift.'
+    )
+
+    async def corrupt():
+        async with TestingSessionLocal() as session:
+            await session.execute(
+                update(CharityProject).values(
+                    invested_amount=0, fully_invested=False, close_date=None
+                )
+            )
+            await session.execute(
+                update(Donation).where(Donation.id == 3).values(invested_amount=7)
+            )
+            await session.execute(
+                delete(DonationAllocation).where(DonationAllocation.donation_id == 2)
+            )
+            await session.commit()
+
+    asyncio.run(corrupt())
+    report, drifts = asyncio.run(run_reconcile(dry_run=True))
+    assert drifts == [
+        (CharityProject, 1), (Donation, 3), (CharityProject, 2),
+    ], 'Dry run must report every drifted row.'
+    assert asyncio.run(project_progress()) == [(0, False), (0, False)], (
+        'Dry run must not write anything.'
+    )
+    asyncio.run(run_reconcile(dry_run=False))
+    assert asyncio.run(project_progress()) == [
+        (project['invested_amount'], project['fully_invested'])
+        for project in expected
+    ], 'Reconciliation must restore the invested amounts and closed flags.'
+    assert asyncio.run(ledger(donation_allocation_crud.get_by_project, 1)) == [
+        (1, 1, 999000), (2, 1, 1000),
+    ], 'Reconciliation must rebuild the allocation ledger.'
+    assert asyncio.run(run_reconcile(dry_run=True))[1] == []
+    assert user_client.get('/stats/').json()['invested_amount'] == 1000500
+
+
+@pytest.fixture
+def group_commit(monkeypatch):
+    monkeypatch.setattr(settings, 'group_commit', True)
+    # The data fixtures freeze the clock: batches are closed by their size.
+    monkeypatch.setattr(settings, 'group_commit_window', 60)
+    monkeypatch.setattr(settings, 'group_commit_size', 3)
+    batches = []
+    commit = allocation_coordinator.commit
+
+    async def counting_commit(sources, invest_in, session):
+        batches.append(len(sources))
+        return await commit(sources, invest_in, session)
+
+    monkeypatch.setattr(allocation_coordinator, 'commit', counting_commit)
+    return batches
+
+
+async def invest_concurrently(sources, invest_in):
+    async def invest(source):
+        async with TestingSessionLocal() as session:
+            session.add(source)
+            return await investment(source, invest_in, session)
+
+    return await asyncio.gather(
+        *(invest(source) for source in sources), return_exceptions=True
+    )
+
+
+def test_group_commit_allocates_in_one_transaction(user_client, charity_project, group_commit):
+    donations = asyncio.run(invest_concurrently(
+        [Donation(full_amount=amount, user_id=2) for amount in (100, 200, 300)],
+        charity_project_crud,
+    ))
+    assert group_commit == [3], (
+        'Concurrent allocations must be committed together.'
+    )
+    assert [(donation.id, donation.full_amount) for donation in donations] == [
+        (1, 100), (2, 200), (3, 300)
+    ], 'Every request must get its own row, in arrival order.'
+    assert user_client.get('/charity_project/').json()[0]['invested_amount'] == 600
+
+
+def test_group_commit_isolates_failed_source(user_client, group_commit):
+    projects = asyncio.run(invest_concurrently(
+        [
+            CharityProject(name=name, description='group', full_amount=100)
+            for name in ('first', 'first', 'second')
+        ],
+        donation_crud,
+    ))
+    assert group_commit == [3, 1, 1, 1]
+    assert isinstance(projects[1], Exception), (
+        'Only the failing allocation of the batch must fail.'
+    )
+    assert [projects[0].name, projects[2].name] == ['first', 'second']
+    assert len(user_client.get('/charity_project/').json()) == 2
+
+
+def test_group_commit_survives_cancelled_leader(monkeypatch):
+    monkeypatch.setattr(settings, 'group_commit_window', 0.01)
+    monkeypatch.setattr(settings, 'group_commit_size', 10)
+
+    async def commit(sources, invest_in, session):
+        return sources
+
+    coordinator = GroupCommitCoordinator(commit)
+
+    async def scenario():
+        async with TestingSessionLocal() as session:
+            leader = asyncio.create_task(coordinator.submit(
+                Donation(full_amount=1), charity_project_crud, session
+            ))
+            await asyncio.sleep(0)
+            follower = asyncio.create_task(coordinator.submit(
+                Donation(full_amount=2), charity_project_crud, session
+            ))
+            await asyncio.sleep(0)
+            leader.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await leader
+            with pytest.raises(RuntimeError):
+                await follower
+            assert coordinator.batches == {}, (
+                'A cancelled leader must not leave its batch open.'
+            )
+            donation = await asyncio.wait_for(coordinator.submit(
+                Donation(full_amount=3), charity_project_crud, session
+            ), 1)
+            assert donation.full_amount == 3
+
+    asyncio.run(scenario())
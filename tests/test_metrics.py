@@ -0,0 +1,49 @@
+import re
+
+
+def sample(client, name, **labels):
+    text = client.get('/metrics').text
+    labels_text = ','.join(f'{key}="{value}"' for key, value in labels.items())
+    if labels_text:
+        name = f'{name}{{{labels_text}}}'
+    match = re.search(rf'^{re.escape(name)} (\S+)$', text, re.MULTILINE)
+    return float(match[1]) if match else 0
+
+
+def test_metrics_format(user_client):
+    response = user_client.get('/metrics')
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain'), (
+        'Metrics must be served in the Prometheus text format.'
+    )
+    for name in (
+        'http_request_duration_seconds', 'http_requests_total',
+        'http_requests_in_progress', 'db_pool_checkout_seconds',
+        'allocation_rows_touched', 'allocation_projects_closed_total',
+    ):
+        assert f'# TYPE {name} ' in response.text, f'`{name}` is not exported.'
+
+
+def test_metrics_by_route_template(user_client, charity_project):
+    route = dict(method='DELETE', route='/charity_project/{project_id}')
+    status = dict(route, status='401')
+    requests_before = sample(user_client, 'http_requests_total', **status)
+    latency_before = sample(
+        user_client, 'http_request_duration_seconds_count', **route
+    )
+    rows_before = sample(user_client, 'allocation_rows_touched_count')
+    user_client.delete('/charity_project/1')
+    user_client.delete('/charity_project/2')
+    user_client.post('/donation/', json={'full_amount': 100})
+    assert sample(
+        user_client, 'http_requests_total', **status
+    ) == requests_before + 2, 'Responses must be counted by route template.'
+    assert sample(
+        user_client, 'http_request_duration_seconds_count', **route
+    ) == latency_before + 2, 'Latency must be observed by route template.'
+    assert sample(
+        user_client, 'allocation_rows_touched_count'
+    ) == rows_before + 1, 'Every allocation must be observed.'
+    assert sample(user_client, 'http_requests_in_progress') == 1, (
+        'Only the metrics request itself must be in progress.'
+    )